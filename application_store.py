@@ -0,0 +1,164 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+
+# Application tracker store for job_matcher.py. Summary fields live in an indexed
+# `applications` table; the long generated texts live in `materials` and are only read
+# when asked for. Every write is a single transaction in WAL mode, so concurrent saves
+# from several sessions cannot overwrite each other. Per-status and per-company totals are
+# kept in `status_totals` and `company_totals` and adjusted in the same transaction as each
+# write, so the tracker's metrics, company list and unfiltered count never scan the table.
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DB_FILE = os.getenv("APPLICATIONS_DB", os.path.join(DATA_DIR, "applications.sqlite"))
+LEGACY_JSON = os.path.join(DATA_DIR, "applications.json")
+
+SUMMARY_FIELDS = ("date", "company", "title", "url", "status", "match_score", "notes")
+MATERIAL_FIELDS = ("cold_email", "cover_letter", "rewritten_cv")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS applications (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    company TEXT NOT NULL,
+    title TEXT NOT NULL,
+    url TEXT,
+    status TEXT NOT NULL,
+    match_score TEXT,
+    notes TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_applications_status ON applications(status);
+CREATE INDEX IF NOT EXISTS idx_applications_company ON applications(company COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_applications_date ON applications(date);
+CREATE TABLE IF NOT EXISTS materials (
+    application_id INTEGER PRIMARY KEY REFERENCES applications(id) ON DELETE CASCADE,
+    cold_email TEXT,
+    cover_letter TEXT,
+    rewritten_cv TEXT
+);
+CREATE TABLE IF NOT EXISTS status_totals (status TEXT PRIMARY KEY, count INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS company_totals (company TEXT PRIMARY KEY, count INTEGER NOT NULL);
+"""
+
+@contextmanager
+def _connect(path=None):
+    db = sqlite3.connect(path or DB_FILE, timeout=10)
+    db.row_factory = sqlite3.Row
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        with db:
+            yield db
+    finally:
+        db.close()
+
+def _bump(db, field, value, amount):
+    # field is "status" or "company", each counted in its own <field>_totals table
+    db.execute(f"INSERT INTO {field}_totals VALUES (?, ?) ON CONFLICT({field}) DO UPDATE SET count = count + excluded.count",
+               (value, amount))
+
+def _insert(db, app):
+    cursor = db.execute(
+        f"INSERT INTO applications ({', '.join(SUMMARY_FIELDS)}) VALUES ({', '.join('?' * len(SUMMARY_FIELDS))})",
+        [app.get(f, "") for f in SUMMARY_FIELDS])
+    db.execute(
+        f"INSERT INTO materials (application_id, {', '.join(MATERIAL_FIELDS)}) VALUES (?, {', '.join('?' * len(MATERIAL_FIELDS))})",
+        [cursor.lastrowid] + [app.get(f, "") for f in MATERIAL_FIELDS])
+    _bump(db, "status", app.get("status", ""), 1)
+    _bump(db, "company", app.get("company", ""), 1)
+    return cursor.lastrowid
+
+def init_store(path=None):
+    """Create the tables, importing the old applications.json once if it exists"""
+    os.makedirs(os.path.dirname(path or DB_FILE), exist_ok=True)
+    with _connect(path) as db:
+        db.executescript(SCHEMA)
+        empty = db.execute("SELECT COUNT(*) FROM applications").fetchone()[0] == 0
+        if empty and os.path.exists(LEGACY_JSON):
+            with open(LEGACY_JSON, 'r') as f:
+                for app in json.load(f):
+                    _insert(db, app)
+            os.replace(LEGACY_JSON, LEGACY_JSON + ".migrated")
+        # Stores created before the counters existed get them rebuilt once
+        for field in ("status", "company"):
+            if not db.execute(f"SELECT COUNT(*) FROM {field}_totals").fetchone()[0]:
+                db.execute(f"INSERT INTO {field}_totals SELECT {field}, COUNT(*) FROM applications GROUP BY {field}")
+
+def save_application(app):
+    with _connect() as db:
+        return _insert(db, app)
+
+def save_applications(apps):
+    """Save many applications in one transaction, returning their ids"""
+    with _connect() as db:
+        return [_insert(db, app) for app in apps]
+
+def update_application(app_id, updates):
+    fields = [f for f in updates if f in SUMMARY_FIELDS]
+    if not fields:
+        return
+    with _connect() as db:
+        old = db.execute("SELECT status, company FROM applications WHERE id = ?", (app_id,)).fetchone()
+        if old is None:
+            return
+        db.execute(f"UPDATE applications SET {', '.join(f + ' = ?' for f in fields)} WHERE id = ?",
+                   [updates[f] for f in fields] + [app_id])
+        for field in ("status", "company"):
+            if field in fields and updates[field] != old[field]:
+                _bump(db, field, old[field], -1)
+                _bump(db, field, updates[field], 1)
+
+def _where(status=None, company=None, date_from=None, date_to=None, before_id=None):
+    clauses, params = [], []
+    if before_id is not None:
+        clauses.append("id < ?")
+        params.append(before_id)
+    if status:
+        clauses.append("status = ?")
+        params.append(status)
+    if company:
+        clauses.append("company = ? COLLATE NOCASE")
+        params.append(company)
+    if date_from:
+        clauses.append("date >= ?")
+        params.append(date_from)
+    if date_to:
+        clauses.append("date <= ?")
+        params.append(date_to)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+def list_applications(status=None, company=None, date_from=None, date_to=None, limit=-1, before_id=None):
+    """Summary rows, newest first, without the generated materials.
+
+    Pages are keyed on id: pass the last id of one page as `before_id` to get the next,
+    which seeks in the primary key instead of skipping over every earlier row."""
+    where, params = _where(status, company, date_from, date_to, before_id)
+    with _connect() as db:
+        rows = db.execute(f"SELECT id, {', '.join(SUMMARY_FIELDS)} FROM applications{where} "
+                          "ORDER BY id DESC LIMIT ?", params + [limit]).fetchall()
+    return [dict(row) for row in rows]
+
+def count_applications(status=None, company=None, date_from=None, date_to=None):
+    with _connect() as db:
+        if not (company or date_from or date_to):
+            # Unfiltered, or by status alone: the counters already hold the answer
+            if status:
+                row = db.execute("SELECT count FROM status_totals WHERE status = ?", (status,)).fetchone()
+                return row[0] if row else 0
+            return db.execute("SELECT COALESCE(SUM(count), 0) FROM status_totals").fetchone()[0]
+        where, params = _where(status, company, date_from, date_to)
+        return db.execute(f"SELECT COUNT(*) FROM applications{where}", params).fetchone()[0]
+
+def status_counts():
+    """Applications per status, read from the counters rather than counted"""
+    with _connect() as db:
+        return dict(db.execute("SELECT status, count FROM status_totals WHERE count > 0").fetchall())
+
+def companies():
+    with _connect() as db:
+        return [row[0] for row in db.execute("SELECT company FROM company_totals WHERE count > 0 ORDER BY company COLLATE NOCASE")]
+
+def get_materials(app_id):
+    with _connect() as db:
+        row = db.execute(f"SELECT {', '.join(MATERIAL_FIELDS)} FROM materials WHERE application_id = ?", (app_id,)).fetchone()
+    return dict(row) if row else {}
@@ -0,0 +1,202 @@
+"""Screen one CV against a whole folder or CSV of job descriptions.
+
+Every posting is first pre-ranked locally: the CV and all job descriptions go into one
+TF-IDF matrix, and a single sparse product against the CV row gives each posting's
+cosine similarity and the share of its keywords the CV covers. Only the top N go through
+the LLM match analysis, as one background job on job_queue's bounded pool (at
+BACKGROUND priority, so interactive calls go first). Each analysis is saved the moment
+it completes, so re-running the same command resumes instead of paying twice. With
+--save the analysed postings go into the application tracker in one transaction.
+
+    python batch_matcher.py --cv cv.txt --jds postings/ --top 20
+    python batch_matcher.py --cv cv.pdf --jds postings.csv --top 50 --save --out screened.csv
+
+A directory is read as one posting per .txt/.md file, titled by file name. A CSV needs
+a description column (description, job_description, jd or text) and may have company,
+title and url columns. pandas, NumPy and scikit-learn are imported on first use.
+"""
+import argparse
+import glob
+import os
+import re
+import sys
+import time
+from llm import BACKGROUND, INTERACTIVE, complete
+from token_budget import message_tokens, truncate
+
+DEFAULT_SYSTEM = "You are an expert recruiter and career coach. Be specific, direct and actionable."
+DESCRIPTION_COLUMNS = ("description", "job_description", "jd", "text")
+# The CV and JD go into every prompt, so each is capped at this many tokens
+DOCUMENT_TOKEN_BUDGET = int(os.getenv("DOCUMENT_TOKEN_BUDGET", "3000"))
+BATCH_TOP_N = int(os.getenv("BATCH_TOP_N", "20"))
+MAX_CONCURRENT_CALLS = int(os.getenv("MAX_CONCURRENT_CALLS", "6"))
+# Pre-rank score = this share of TF-IDF cosine similarity plus the rest keyword coverage
+SIMILARITY_WEIGHT = 0.6
+
+def prompt_messages(prompt, system=DEFAULT_SYSTEM):
+    return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+def analysis_prompt(cv_text, jd_text):
+    return f"""Analyse this CV against this job description.
+
+CV: {cv_text}
+
+Job Description: {jd_text}
+
+Provide exactly:
+1. MATCH SCORE (0-100) with one line explanation
+2. TOP 3 STRENGTHS
+3. TOP 3 GAPS
+4. ONE SENTENCE SUMMARY of what the hiring manager will think"""
+
+def llm_step(payload):
+    """job_queue handler: one chat completion through the shared client and cache"""
+    from llm_client import get_client
+    from response_cache import get_cache
+    return complete(get_client(), payload["messages"], cache=get_cache(), priority=payload.get("priority", INTERACTIVE))
+
+def match_score(analysis):
+    """The 0-100 score from a match analysis, or None if it has none"""
+    # Models usually echo the prompt's "MATCH SCORE (0-100)" header; its 0 is not the score
+    found = re.search(r"match score(?:\s*\(0\s*[-–]\s*100\))?\D{0,20}(\d{1,3})", analysis or "", re.IGNORECASE)
+    return min(int(found.group(1)), 100) if found else None
+
+def read_text(path):
+    if path.lower().endswith(".pdf"):
+        from pypdf import PdfReader
+        return "\n".join(page.extract_text() or "" for page in PdfReader(path).pages)
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+def postings_from_csv(source, name="csv"):
+    """Postings from a CSV path or file object, as company/title/url/jd/source columns"""
+    import pandas as pd
+    df = pd.read_csv(source, dtype=str).fillna("")
+    columns = {c.lower().strip(): c for c in df.columns}
+    description = next((columns[c] for c in DESCRIPTION_COLUMNS if c in columns), None)
+    if description is None:
+        raise ValueError(f"{name} has no description column (one of {', '.join(DESCRIPTION_COLUMNS)})")
+    postings = pd.DataFrame({field: df[columns[field]] if field in columns else "" for field in ("company", "title", "url")})
+    postings["jd"] = df[description]
+    postings["source"] = [f"{name}:{i + 2}" for i in range(len(df))]
+    return postings[postings["jd"].str.strip() != ""].reset_index(drop=True)
+
+def postings_from_texts(named_texts):
+    """Postings from (file name, text) pairs, titled by file name"""
+    import pandas as pd
+    rows = [{"company": "", "title": os.path.splitext(os.path.basename(name))[0], "url": "", "jd": text, "source": name}
+            for name, text in named_texts if text.strip()]
+    return pd.DataFrame(rows, columns=["company", "title", "url", "jd", "source"])
+
+def load_postings(path):
+    if os.path.isdir(path):
+        files = sorted(f for pattern in ("*.txt", "*.md") for f in glob.glob(os.path.join(path, pattern)))
+        return postings_from_texts((f, read_text(f)) for f in files)
+    return postings_from_csv(path, os.path.basename(path))
+
+def postings_from_uploads(uploads):
+    """Postings from Streamlit uploads: CSVs plus one posting per text file"""
+    import pandas as pd
+    csvs = [postings_from_csv(f, f.name) for f in uploads if f.name.lower().endswith(".csv")]
+    texts = [(f.name, f.getvalue().decode("utf-8", errors="replace")) for f in uploads if not f.name.lower().endswith(".csv")]
+    return pd.concat(csvs + [postings_from_texts(texts)], ignore_index=True)
+
+def prerank(cv_text, postings):
+    """Postings sorted by local similarity to the CV, with prerank_score, similarity and keyword_coverage"""
+    import numpy as np
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    ranked = postings.copy()
+    try:
+        matrix = TfidfVectorizer(sublinear_tf=True, stop_words="english").fit_transform([cv_text] + list(postings["jd"]))
+    except ValueError:
+        # Nothing but stop words: no posting can be told apart
+        matrix = None
+    if matrix is None or len(postings) == 0:
+        similarity = coverage = np.zeros(len(postings))
+    else:
+        # Rows are L2-normalised, so one sparse product scores every posting against the CV
+        similarity = (matrix[1:] @ matrix[0].T).toarray().ravel()
+        present = (matrix > 0).astype(np.float64)
+        terms = np.asarray(present[1:].sum(axis=1)).ravel()
+        coverage = (present[1:] @ present[0].T).toarray().ravel() / np.maximum(terms, 1)
+    ranked["similarity"] = similarity.round(3)
+    ranked["keyword_coverage"] = coverage.round(3)
+    ranked["prerank_score"] = (SIMILARITY_WEIGHT * similarity + (1 - SIMILARITY_WEIGHT) * coverage).round(3)
+    return ranked.sort_values("prerank_score", ascending=False, kind="stable").reset_index(drop=True)
+
+def submit_batch(runner, cv_text, top):
+    """Queue the match analysis of each of the `top` postings as one job_queue job"""
+    cv_text = truncate(cv_text, DOCUMENT_TOKEN_BUDGET)
+    steps, jobs, tokens = [], [], {}
+    for i, row in enumerate(top.itertuples(index=False)):
+        key = f"posting_{i}"
+        messages = prompt_messages(analysis_prompt(cv_text, truncate(row.jd, DOCUMENT_TOKEN_BUDGET)))
+        steps.append((key, f"{row.company or 'Unknown'} — {row.title or 'Untitled'}", {"messages": messages, "priority": BACKGROUND}))
+        jobs.append({"step": key, "company": row.company, "title": row.title, "url": row.url,
+                     "source": row.source, "prerank_score": float(row.prerank_score)})
+        tokens[key] = message_tokens(messages)
+    return runner.submit("batch", steps, meta={"jobs": jobs, "tokens": tokens})
+
+def batch_results(job):
+    """One row per analysed posting, best match score first"""
+    import pandas as pd
+    steps = {step["step"]: step for step in job["steps"]}
+    rows = []
+    for posting in job["meta"]["jobs"]:
+        step = steps[posting["step"]]
+        analysis = step["result"] if step["status"] == "done" else f"⚠️ Analysis {step['status']}: {step['error'] or ''}"
+        rows.append({**posting, "match_score": match_score(analysis), "status": step["status"], "analysis": analysis})
+    results = pd.DataFrame(rows)
+    return results.sort_values(["match_score", "prerank_score"], ascending=False, na_position="last").reset_index(drop=True)
+
+def tracker_rows(results, status="To Apply"):
+    """Tracker entries for the analysed postings, for application_store.save_applications"""
+    import pandas as pd
+    date = time.strftime("%Y-%m-%d")
+    return [{"date": date, "company": row.company or "Unknown", "title": row.title or "Unknown", "url": row.url or "",
+             "status": status, "match_score": "N/A" if pd.isna(row.match_score) else f"{int(row.match_score)}/100",
+             "notes": f"Batch screening · pre-rank {row.prerank_score:.2f} · {row.source}"}
+            for row in results[results["status"] == "done"].itertuples(index=False)]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cv", required=True, help="CV as .txt, .md or .pdf")
+    parser.add_argument("--jds", required=True, help="directory of .txt/.md postings, or a CSV")
+    parser.add_argument("--top", type=int, default=BATCH_TOP_N, help="postings sent to the LLM (0: pre-rank only)")
+    parser.add_argument("--workers", type=int, default=MAX_CONCURRENT_CALLS)
+    parser.add_argument("--save", action="store_true", help="add the analysed postings to the tracker")
+    parser.add_argument("--out", help="write the results CSV here instead of stdout")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    cv_text = read_text(args.cv)
+    postings = load_postings(args.jds)
+    ranked = prerank(cv_text, postings)
+    print(f"Pre-ranked {len(ranked):,} postings", file=sys.stderr)
+    if args.top <= 0 or ranked.empty:
+        results = ranked.drop(columns="jd")
+    else:
+        import job_queue
+        runner = job_queue.JobRunner(llm_step, workers=args.workers)
+        job_id = submit_batch(runner, cv_text, ranked.head(args.top))
+        done = -1
+        while True:
+            job = runner.get_job(job_id)
+            finished = sum(step["status"] in job_queue.FINISHED for step in job["steps"])
+            if finished != done:
+                done = finished
+                print(f"Analysed {done}/{len(job['steps'])} (job {job_id})", file=sys.stderr)
+            if job["status"] in job_queue.FINISHED:
+                break
+            time.sleep(0.5)
+        results = batch_results(job)
+        if args.save:
+            import application_store
+            application_store.init_store()
+            saved = application_store.save_applications(tracker_rows(results))
+            print(f"Saved {len(saved)} applications to the tracker", file=sys.stderr)
+    results.to_csv(args.out or sys.stdout, index=False)
+
+if __name__ == "__main__":
+    main()
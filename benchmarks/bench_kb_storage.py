@@ -0,0 +1,64 @@
+"""Recall@k and memory of the knowledge base under each vector storage.
+
+Loads the same synthetic corpus as bench_retrieval.py into a KnowledgeBase per
+KB_VECTOR_STORAGE option and reports recall, query latency and index bytes per chunk
+as JSON. Dense embeddings are included with --dense (needs sentence-transformers).
+
+    python benchmarks/bench_kb_storage.py --chunks 5000 --storage flat fp16 sq8
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from bench_retrieval import make_corpus, make_queries
+from knowledge_base import KnowledgeBase, DenseEncoder
+
+def run(storage, texts, queries, sources, k, dense):
+    kb = KnowledgeBase(dense=dense, storage=storage)
+    start = time.perf_counter()
+    kb.add_document("bench", "bench", ({"text": text, "page": 1} for text in texts))
+    build = time.perf_counter() - start
+    latencies, hits = [], 0
+    for query, source in zip(queries, sources):
+        start = time.perf_counter()
+        found = kb.search(query, k)
+        latencies.append(time.perf_counter() - start)
+        hits += int(any(hit["text"] == texts[source] for hit in found))
+    memory = kb.memory_report()
+    return {
+        "storage": storage,
+        "dense": dense.model_name if dense else None,
+        "chunks": len(texts),
+        "build_s": round(build, 3),
+        f"recall@{k}": round(hits / len(queries), 3),
+        "query_ms_mean": round(float(np.mean(latencies) * 1000), 3),
+        "index_mb": round((memory["lexical"] + memory["dense"]) / 1e6, 2),
+        "bytes_per_chunk": round((memory["lexical"] + memory["dense"]) / len(texts)),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--storage", nargs="+", default=["flat", "fp16", "sq8"])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dense", action="store_true", help="add the KB_DENSE_MODEL embeddings")
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    dense = DenseEncoder() if args.dense else None
+    results = []
+    for n in args.chunks:
+        texts = make_corpus(n)
+        queries, sources = make_queries(texts, min(args.queries, n))
+        for storage in args.storage:
+            results.append(run(storage, texts, queries, sources, args.k, dense))
+            print(json.dumps(results[-1]), file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Recall@k and latency of each retrieval backend against the original flat index.
+
+Builds a synthetic corpus with a Zipf-distributed vocabulary, then queries it with
+short word samples taken from known chunks; a hit is the source chunk showing up
+in the top k. Results are printed as JSON.
+
+    python benchmarks/bench_retrieval.py --chunks 2000 20000 --backends flat bm25 hnsw
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import retrieval
+
+def make_corpus(n_chunks, vocab_size=30000, words_per_chunk=80, seed=0):
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"term{i}" for i in range(vocab_size)])
+    weights = 1.0 / np.arange(1, vocab_size + 1)
+    weights /= weights.sum()
+    words = rng.choice(vocab_size, size=(n_chunks, words_per_chunk), p=weights)
+    return [" ".join(vocab[row]) for row in words]
+
+def make_queries(texts, n_queries, words_per_query=6, seed=1):
+    rng = np.random.default_rng(seed)
+    sources = rng.choice(len(texts), size=n_queries, replace=False)
+    queries = []
+    for i in sources:
+        words = texts[i].split()
+        queries.append(" ".join(rng.choice(words, size=words_per_query, replace=False)))
+    return queries, sources
+
+def index_bytes(engine):
+    index = getattr(engine, "index", None)
+    if index is not None:
+        import faiss
+        return int(faiss.serialize_index(index).nbytes)
+    m = engine.matrix
+    return int(m.data.nbytes + m.indices.nbytes + m.indptr.nbytes)
+
+def run(backend, texts, queries, sources, k):
+    start = time.perf_counter()
+    engine = retrieval.build_index(texts, backend)
+    build = time.perf_counter() - start
+    latencies, hits = [], 0
+    for query, source in zip(queries, sources):
+        start = time.perf_counter()
+        ids = [i for i, _ in engine.search(query, k)]
+        latencies.append(time.perf_counter() - start)
+        hits += int(source in ids)
+    latencies = np.array(latencies) * 1000
+    return {
+        "backend": backend,
+        "chunks": len(texts),
+        "build_s": round(build, 3),
+        f"recall@{k}": round(hits / len(queries), 3),
+        "query_ms_mean": round(float(latencies.mean()), 3),
+        "query_ms_p95": round(float(np.percentile(latencies, 95)), 3),
+        "index_mb": round(index_bytes(engine) / 1e6, 2),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--backends", nargs="+", default=list(retrieval.BACKENDS))
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    results = []
+    for n in args.chunks:
+        texts = make_corpus(n)
+        queries, sources = make_queries(texts, min(args.queries, n))
+        for backend in args.backends:
+            results.append(run(backend, texts, queries, sources, args.k))
+            print(json.dumps(results[-1]), file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
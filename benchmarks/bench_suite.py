@@ -0,0 +1,340 @@
+"""Offline benchmark suite: ingestion, retrieval, dashboard aggregation, chat turns and imports.
+
+Runs without network access or API keys. Each benchmark returns one JSON record per case:
+  ingest     PDF parsing, chunking and indexing, the same stages as
+             document_service.ingest_document, on the bundled docs and on synthetic PDFs
+  retrieval  index build, query latency and recall@k of the document backend and of
+             the knowledge base search the chatbot uses
+  dashboard  the sales cube build, filter and group-by path and the supply chain filter,
+             group-bys and risk engine at 1x, 100x and 10,000x the shipped data
+  chat       end-to-end chat turns (search, context packing, history trimming,
+             streaming) against llm.FakeClient with a configurable latency
+  imports    each app's cold-start import time (see import_profile.py)
+
+The full report goes to stdout (or --out). With --baseline, the run is compared to an
+earlier report and the exit status is 1 if any timing got slower by more than
+--threshold (and by at least --min-ms, so timer noise on tiny cases is ignored) or any
+recall dropped.
+
+    python benchmarks/bench_suite.py --out before.json
+    python benchmarks/bench_suite.py --baseline before.json --out after.json
+    python benchmarks/bench_suite.py --only chat --llm-latency 0.4 --token-delay 0.02
+"""
+import argparse
+import glob
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import generate_data
+import import_profile
+import ingest
+import retrieval
+import supplier_risk
+from bench_retrieval import make_corpus, make_queries
+from document_service import BACKEND
+from knowledge_base import KnowledgeBase
+from llm import FakeClient, stream_chat
+from sales_cube import SalesCube
+from token_budget import pack_chunks, trim_history
+
+BENCHES = ("ingest", "retrieval", "dashboard", "chat", "imports")
+# Rows in the shipped extracts; --scales multiplies these
+SALES_ROWS = 12 * len(generate_data.REGION_BASE) * len(generate_data.PRODUCT_MULT)
+SUPPLY_ROWS = 12 * len(generate_data.SUPPLIERS) * len(generate_data.CATEGORIES)
+
+def timed(fn, repeat=1):
+    """Run `fn` `repeat` times; returns (last result, median milliseconds)"""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - start)
+    return result, round(float(np.median(times)) * 1000, 3)
+
+def percentiles(latencies, name):
+    ms = np.array(latencies) * 1000
+    return {f"{name}_ms_mean": round(float(ms.mean()), 3), f"{name}_ms_p95": round(float(np.percentile(ms, 95)), 3)}
+
+# --- ingestion ---------------------------------------------------------------------
+
+def make_pdf(pages, words_per_page=400, seed=0):
+    """A minimal text-only PDF with `pages` pages of synthetic words"""
+    texts = make_corpus(pages, words_per_chunk=words_per_page, seed=seed)
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in texts:
+        words = text.split()
+        lines = [" ".join(words[i:i + 12]) for i in range(0, len(words), 12)]
+        stream = "BT /F1 10 Tf 14 TL 40 800 Td " + " ".join(f"({line}) '" for line in lines) + " ET"
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream.encode()))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects))
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+    out, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+def bench_ingest(args):
+    documents = [(os.path.relpath(path, ROOT), open(path, "rb").read())
+                 for path in sorted(glob.glob(os.path.join(ROOT, "docs", "*.pdf")))]
+    documents += [(f"synthetic-{pages}p", make_pdf(pages)) for pages in args.pdf_pages]
+    results = []
+    for name, file_bytes in documents:
+        timings = {}
+        start = time.perf_counter()
+        chunks = list(ingest.ingest_pdf(file_bytes, timings, args.workers))
+        index_start = time.perf_counter()
+        # Scanned PDFs have no text layer, so there is nothing to index
+        if chunks:
+            retrieval.build_index([c["text"] for c in chunks], BACKEND)
+        end = time.perf_counter()
+        results.append({
+            "bench": "ingest", "case": name, "backend": BACKEND, "workers": args.workers,
+            "pages": timings.get("pages", 0), "chunks": len(chunks),
+            "extract_s": round(timings.get("extract", 0.0), 3),
+            "split_s": round(timings.get("split", 0.0), 3),
+            "index_s": round(end - index_start, 3),
+            "total_s": round(end - start, 3),
+        })
+    return results
+
+# --- retrieval ---------------------------------------------------------------------
+
+def bench_retrieval(args):
+    results = []
+    for n in args.chunks:
+        texts = make_corpus(n)
+        queries, sources = make_queries(texts, min(args.queries, n))
+        # Document apps: one engine per document, searched by chunk id
+        engine, build_ms = timed(lambda: retrieval.build_index(texts, BACKEND))
+        latencies, hits = [], 0
+        for query, source in zip(queries, sources):
+            start = time.perf_counter()
+            ids = [i for i, _ in engine.search(query, args.k)]
+            latencies.append(time.perf_counter() - start)
+            hits += int(source in ids)
+        results.append({"bench": "retrieval", "case": f"document-{BACKEND}-{n}", "chunks": n,
+                        "build_ms": build_ms, f"recall@{args.k}": round(hits / len(queries), 3),
+                        **percentiles(latencies, "query")})
+
+        # Chatbot: the knowledge base's hybrid search over every document
+        kb = KnowledgeBase()
+        _, build_ms = timed(lambda: kb.add_document("bench", "bench", ({"text": t, "page": 1} for t in texts)))
+        latencies, hits = [], 0
+        for query, source in zip(queries, sources):
+            start = time.perf_counter()
+            found = kb.search(query, args.k)
+            latencies.append(time.perf_counter() - start)
+            hits += int(any(hit["text"] == texts[source] for hit in found))
+        results.append({"bench": "retrieval", "case": f"knowledge-base-{kb.retrieval_mode}-{n}", "chunks": n,
+                        "build_ms": build_ms, f"recall@{args.k}": round(hits / len(queries), 3),
+                        **percentiles(latencies, "query")})
+    return results
+
+# --- dashboards --------------------------------------------------------------------
+
+def _frame(chunks, labels):
+    df = pd.concat(chunks, ignore_index=True)
+    # load_table hands the dashboards categoricals for the label columns
+    return df.astype({label: "category" for label in labels})
+
+def sales_frame(scale, months):
+    rows = SALES_ROWS * scale
+    regions = max(len(generate_data.REGION_BASE), math.ceil(rows / (len(months) * len(generate_data.PRODUCT_MULT))))
+    chunks = generate_data.sales_chunks(months, generate_data.entity_names(generate_data.REGION_BASE, regions, "Region"),
+                                        list(generate_data.PRODUCT_MULT), np.random.default_rng(42), 1_000_000)
+    return _frame(chunks, ["month", "region", "product"])
+
+def supply_frame(scale, months):
+    rows = SUPPLY_ROWS * scale
+    suppliers = max(len(generate_data.SUPPLIERS), math.ceil(rows / (len(months) * len(generate_data.CATEGORIES))))
+    chunks = generate_data.supply_chain_chunks(months, generate_data.entity_names(generate_data.SUPPLIERS, suppliers, "Supplier"),
+                                               list(generate_data.CATEGORIES), np.random.default_rng(42), 1_000_000)
+    return _frame(chunks, ["month", "supplier", "category"])
+
+def sales_rerun(cube, months, regions, products):
+    """What sales_dashboard.py computes on every rerun after the cube is loaded"""
+    filtered = cube.slice(months=months, regions=regions, products=products)
+    totals = [filtered.total(m) for m in ("revenue", "units_sold", "target")]
+    frames = [filtered.frame(by, ["revenue"]) for by in (["month"], ["region"], ["product"], ["month", "region"])]
+    return totals, frames
+
+def supply_rerun(df, suppliers, categories):
+    """What supply_chain_dashboard.py computes on every rerun for its KPIs and charts"""
+    filtered = df[df["supplier"].isin(suppliers) & df["category"].isin(categories)]
+    kpis = (filtered["delivery_rate"].mean(), filtered["lead_time_days"].mean(),
+            filtered["stockout_incident"].sum(), filtered["order_value"].sum())
+    charts = [
+        filtered.groupby("supplier", observed=True).agg(delivery_rate=("delivery_rate", "mean"),
+                                                         quality_score=("quality_score", "mean"),
+                                                         stockouts=("stockout_incident", "sum")),
+        filtered.groupby(["month", "supplier"], observed=True)["delivery_rate"].mean(),
+        filtered.groupby("supplier", observed=True)["lead_time_days"].mean(),
+        filtered.groupby("supplier", observed=True)["stockout_incident"].sum(),
+    ]
+    return filtered, kpis, charts
+
+def bench_dashboard(args):
+    months = pd.date_range("2024-01-01", periods=12, freq="ME")
+    results = []
+    for scale in args.scales:
+        df = sales_frame(scale, months)
+        cube, build_ms = timed(lambda: SalesCube.from_frame(df))
+        # Half of every axis selected, as after a typical filter change
+        pick = {dim: cube.axes[dim][::2] for dim in ("month", "region", "product")}
+        _, all_ms = timed(lambda: sales_rerun(cube, None, None, None), args.repeat)
+        _, filter_ms = timed(lambda: sales_rerun(cube, pick["month"], pick["region"], pick["product"]), args.repeat)
+        results.append({"bench": "dashboard", "case": f"sales-{scale}x", "rows": len(df),
+                        "cube_build_ms": build_ms, "rerun_all_ms": all_ms, "rerun_filtered_ms": filter_ms})
+        del df, cube
+
+        df = supply_frame(scale, months)
+        suppliers = list(df["supplier"].cat.categories)
+        categories = list(df["category"].cat.categories)
+        _, all_ms = timed(lambda: supply_rerun(df, suppliers, categories), args.repeat)
+        _, filter_ms = timed(lambda: supply_rerun(df, suppliers[::2], categories[::2]), args.repeat)
+        _, risk_ms = timed(lambda: supplier_risk.analyse(df), args.repeat)
+        results.append({"bench": "dashboard", "case": f"supply-chain-{scale}x", "rows": len(df),
+                        "rerun_all_ms": all_ms, "rerun_filtered_ms": filter_ms, "risk_engine_ms": risk_ms})
+        del df
+    return results
+
+# --- chat --------------------------------------------------------------------------
+
+def bench_chat(args):
+    texts = make_corpus(args.chat_chunks, seed=2)
+    questions, _ = make_queries(texts, args.turns, seed=3)
+    kb = KnowledgeBase()
+    kb.add_document("bench", "bench", ({"text": t, "page": 1} for t in texts))
+    reply = " ".join(make_corpus(1, words_per_chunk=args.reply_words, seed=4)[0].split())
+    client = FakeClient(reply=reply, latency=args.llm_latency, token_delay=args.token_delay)
+
+    history, turns, prepare, ttft, prompt_tokens = [], [], [], [], []
+    for question in questions:
+        start = time.perf_counter()
+        history.append({"role": "user", "content": question})
+        # Same steps as a rag_chatbot.py turn
+        relevant, _ = pack_chunks(kb.search(question, 8))
+        context = "\n\n".join(f"[{h['source']}, p. {h['page']}]\n{h['text']}" for h in relevant)
+        messages = [{"role": "system", "content": f"Answer based on this document context:\n{context}"}] + trim_history(history)
+        prepared = time.perf_counter()
+        stats = {}
+        answer = "".join(stream_chat(client, messages, stats=stats))
+        turns.append(time.perf_counter() - start)
+        prepare.append(prepared - start)
+        ttft.append(stats["ttft"] + prepared - start)
+        prompt_tokens.append(stats["prompt_tokens"])
+        history.append({"role": "assistant", "content": answer})
+    return [{"bench": "chat", "case": f"rag-{args.chat_chunks}-chunks", "turns": len(turns),
+             "llm_latency_s": args.llm_latency, "token_delay_s": args.token_delay,
+             "prompt_tokens_mean": round(float(np.mean(prompt_tokens))),
+             **percentiles(prepare, "prepare"), **percentiles(ttft, "ttft"), **percentiles(turns, "turn")}]
+
+# --- imports -----------------------------------------------------------------------
+
+def bench_imports(args):
+    baseline = {name for name, *_ in import_profile.run_probe([])[0]}
+    results = []
+    for app in import_profile.APPS:
+        report = import_profile.profile(os.path.join(ROOT, app), baseline=baseline)
+        results.append({"bench": "imports", "case": app, "import_ms": report["import_ms"], "modules": report["modules"],
+                        "missing": len(report["missing"])})
+    return results
+
+# --- reporting ---------------------------------------------------------------------
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit, "python": platform.python_version(),
+            "machine": platform.machine(), "cpus": os.cpu_count()}
+
+def compare(baseline, results, threshold, min_ms):
+    """Print how each timing and recall moved against `baseline`; returns the regressions"""
+    before = {(r["bench"], r["case"]): r for r in baseline["results"]}
+    regressions = []
+    for result in results:
+        old = before.get((result["bench"], result["case"]))
+        if old is None:
+            continue
+        for metric, value in result.items():
+            previous = old.get(metric)
+            if not isinstance(value, (int, float)) or not isinstance(previous, (int, float)):
+                continue
+            if metric.endswith(("_ms", "_s", "_ms_mean", "_ms_p95")) and previous > 0:
+                ratio = value / previous
+                unit = 1 if "_ms" in metric else 1000
+                worse = ratio > threshold and (value - previous) * unit >= min_ms
+            elif metric.startswith("recall@"):
+                ratio = value / previous if previous else 1.0
+                worse = value < previous
+            else:
+                continue
+            line = f"{result['bench']:<10} {result['case']:<32} {metric:<20} {previous:>10} → {value:<10} x{ratio:.2f}"
+            print(("REGRESSION " if worse else "           ") + line, file=sys.stderr)
+            if worse:
+                regressions.append(line)
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=BENCHES, default=list(BENCHES))
+    parser.add_argument("--out", help="also write the report to this file")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--threshold", type=float, default=1.2, help="slowdown ratio counted as a regression")
+    parser.add_argument("--min-ms", type=float, default=2.0, help="smallest slowdown in ms counted as a regression")
+    parser.add_argument("--pdf-pages", type=int, nargs="+", default=[50, 400])
+    parser.add_argument("--workers", type=int, default=ingest.INGEST_WORKERS)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=3)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1, 100, 10000])
+    parser.add_argument("--repeat", type=int, default=5, help="runs per dashboard timing (median kept)")
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--chat-chunks", type=int, default=2000)
+    parser.add_argument("--reply-words", type=int, default=150)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="fake LLM seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="fake LLM seconds between streamed words")
+    args = parser.parse_args()
+
+    benches = {"ingest": bench_ingest, "retrieval": bench_retrieval, "dashboard": bench_dashboard, "chat": bench_chat,
+               "imports": bench_imports}
+    results = []
+    for name in args.only:
+        for result in benches[name](args):
+            results.append(result)
+            print(json.dumps(result), file=sys.stderr)
+    report = {"environment": environment(), "args": vars(args), "results": results}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(json.load(f), results, args.threshold, args.min_ms)
+        if regressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
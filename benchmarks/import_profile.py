@@ -0,0 +1,98 @@
+"""Import-time profile of each Streamlit app's cold start.
+
+Runs every app's module-level imports in a fresh interpreter under `python -X importtime`
+and reports the total import time plus the heaviest top-level modules, as JSON. The apps
+themselves are not executed, so no API keys or Streamlit server are needed; modules that
+are not installed are listed under "missing" instead of failing the run.
+
+    python benchmarks/import_profile.py
+    python benchmarks/import_profile.py --apps rag_chatbot.py --top 15
+"""
+import argparse
+import ast
+import json
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ("first_call.py", "rag_chatbot.py", "meeting_prep.py", "job_matcher.py",
+        "sales_dashboard.py", "supply_chain_dashboard.py")
+
+# Imports each statement on its own, so one missing package does not hide the others
+PROBE = """
+import sys
+missing = []
+for module in sys.argv[1:]:
+    try:
+        __import__(module)
+    except ImportError as e:
+        missing.append(f"{module}: {e}")
+print("\\n".join(missing))
+"""
+
+def app_imports(path):
+    """Modules imported at the top level of a script, in order"""
+    with open(path) as f:
+        tree = ast.parse(f.read(), path)
+    modules = []
+    for node in tree.body:
+        if isinstance(node, ast.Import):
+            modules.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.level == 0:
+            modules.append(node.module)
+    return list(dict.fromkeys(modules))
+
+def parse_importtime(stderr):
+    """(module, self microseconds, cumulative microseconds, depth) per line of -X importtime output"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        rows.append((name.strip(), int(own), int(cumulative), depth))
+    return rows
+
+def run_probe(modules):
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", PROBE, *modules],
+                            cwd=ROOT, capture_output=True, text=True, env={**os.environ, "PYTHONPATH": ROOT})
+    return parse_importtime(result.stderr), [line for line in result.stdout.splitlines() if line]
+
+def profile(path, top=10, baseline=None):
+    """Import cost of one app, leaving out what the bare interpreter imports anyway"""
+    if baseline is None:
+        baseline = {name for name, *_ in run_probe([])[0]}
+    rows, missing = run_probe(app_imports(path))
+    rows = [row for row in rows if row[0] not in baseline]
+    # Self time summed per top-level package shows which dependency the time goes to
+    packages = {}
+    for name, own, _, _ in rows:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + own
+    heaviest = sorted(packages.items(), key=lambda item: -item[1])
+    return {
+        "app": os.path.basename(path),
+        "import_ms": round(sum(cumulative for _, _, cumulative, depth in rows if depth == 0) / 1000, 1),
+        "modules": len(rows),
+        "heaviest": [{"package": name, "ms": round(us / 1000, 1)} for name, us in heaviest[:top]],
+        "missing": missing,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--apps", nargs="+", default=list(APPS))
+    parser.add_argument("--top", type=int, default=10, help="heaviest modules listed per app")
+    args = parser.parse_args()
+
+    baseline = {name for name, *_ in run_probe([])[0]}
+    results = []
+    for app in args.apps:
+        results.append(profile(os.path.join(ROOT, app), args.top, baseline))
+        report = results[-1]
+        heaviest = ", ".join(f"{m['package']} {m['ms']:.0f}ms" for m in report["heaviest"][:5])
+        print(f"{report['app']:<28} {report['import_ms']:>8.1f} ms  {heaviest}", file=sys.stderr)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+import os
+import pyarrow as pa
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
+
+# Columnar loading for the dashboards. Each CSV is converted once, in streaming batches,
+# into a Parquet file next to it; the source CSV's size and mtime are stored in the
+# Parquet metadata so the file is only rebuilt when the CSV changes. Reads are
+# memory-mapped, project only the requested columns, and decode the categorical columns
+# straight into pandas categoricals from the Parquet dictionaries, with sorted categories.
+FINGERPRINT_KEY = b"source_csv"
+
+def source_fingerprint(csv_path):
+    """Changes whenever the CSV is rewritten; also usable as a Streamlit cache key"""
+    stat = os.stat(csv_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+def parquet_path(csv_path):
+    return os.path.splitext(csv_path)[0] + ".parquet"
+
+def _is_current(path, fingerprint):
+    try:
+        metadata = pq.read_schema(path).metadata or {}
+    except (FileNotFoundError, pa.ArrowInvalid):
+        return False
+    return metadata.get(FINGERPRINT_KEY) == fingerprint.encode()
+
+def convert_csv(csv_path, categorical=()):
+    """Rewrite the CSV as Parquet batch by batch, so memory stays flat for multi-GB files"""
+    target = parquet_path(csv_path)
+    tmp_path = target + ".tmp"
+    # Keep label columns as strings even when they look like dates or numbers
+    options = pv.ConvertOptions(column_types={name: pa.string() for name in categorical})
+    reader = pv.open_csv(csv_path, convert_options=options)
+    schema = reader.schema.with_metadata({FINGERPRINT_KEY: source_fingerprint(csv_path).encode()})
+    with pq.ParquetWriter(tmp_path, schema, use_dictionary=list(categorical) or True, compression="zstd") as writer:
+        for batch in reader:
+            writer.write_table(pa.Table.from_batches([batch], schema=schema))
+    os.replace(tmp_path, target)
+    return target
+
+def load_table(csv_path, columns=None, categorical=()):
+    """Load the CSV's columnar copy as a DataFrame, converting it first if it is stale"""
+    path = parquet_path(csv_path)
+    if not _is_current(path, source_fingerprint(csv_path)):
+        convert_csv(csv_path, categorical)
+    dictionary_columns = [c for c in categorical if columns is None or c in columns]
+    table = pq.read_table(path, columns=columns, memory_map=True, read_dictionary=dictionary_columns)
+    df = table.to_pandas()
+    # Dictionaries list values in order of first appearance; sorted categories make
+    # groupby and factorize(sort=True) order labels (months chronologically) as for strings
+    for name in dictionary_columns:
+        df[name] = df[name].cat.reorder_categories(sorted(df[name].cat.categories))
+    return df
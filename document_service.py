@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+import index_cache
+import ingest
+import retrieval
+from tracing import span
+
+# Shared document service for the document apps. A PDF is parsed, chunked and indexed
+# once per deployment: its chunks and retrieval engine are stored in the index cache
+# under the file's SHA-256, which is also its doc_id, and every app in every process
+# opens them from there. The most recently used documents stay loaded in memory, up to
+# DOCUMENT_SERVICE_MAX_LOADED per process. Apps that keep their own index, like the
+# knowledge base, take a document's chunks as a stream from `document_chunks` instead, so
+# the whole document is never held in memory; the chunks are written to the store as they
+# stream, and the retrieval engine is only built if the document is searched here later.
+# A PDF without a text layer is stored as an empty document, whose searches find nothing.
+BACKEND = os.getenv("DOCUMENT_RETRIEVAL_BACKEND", "bm25")
+MAX_LOADED = int(os.getenv("DOCUMENT_SERVICE_MAX_LOADED", "8"))
+
+_loaded = OrderedDict()
+_lock = threading.Lock()
+_ingest_locks = {}
+
+def _remember(doc_id, document):
+    with _lock:
+        _loaded[doc_id] = document
+        _loaded.move_to_end(doc_id)
+        while len(_loaded) > MAX_LOADED:
+            _loaded.popitem(last=False)
+
+def open_document(doc_id):
+    """Return (chunks, engine) for an ingested document, or None if it is unknown.
+
+    The engine is None until the document is first searched, or if it has no chunks."""
+    with _lock:
+        if doc_id in _loaded:
+            _loaded.move_to_end(doc_id)
+            return _loaded[doc_id]
+    document = index_cache.load_index(doc_id, BACKEND)
+    if document is None:
+        return None
+    chunks, engine = document
+    # Entries written before pages were kept hold bare strings
+    chunks = [c if isinstance(c, dict) else {"text": c, "page": None} for c in chunks]
+    _remember(doc_id, (chunks, engine))
+    return chunks, engine
+
+@contextmanager
+def _ingest_lock(doc_id):
+    # Concurrent uploads of the same file in this process wait for the first one; the
+    # entry is dropped when the last of them is done, so the map stays small
+    with _lock:
+        entry = _ingest_locks.setdefault(doc_id, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _lock:
+            entry[1] -= 1
+            if not entry[1]:
+                del _ingest_locks[doc_id]
+
+def _build_engine(chunks, timings):
+    if not chunks:
+        return None
+    with span("build_index", backend=BACKEND, chunks=len(chunks)):
+        started = time.perf_counter()
+        engine = retrieval.build_index([c["text"] for c in chunks], BACKEND)
+        timings["index"] = time.perf_counter() - started
+    return engine
+
+def ingest_document(file_bytes, timings=None, workers=ingest.INGEST_WORKERS):
+    """Parse, chunk and index a PDF unless it already is; returns its doc_id.
+
+    `timings` is only filled in when the document was actually ingested."""
+    doc_id = index_cache.document_hash(file_bytes)
+    with span("ingest_document", doc_id=doc_id[:12], cache_hit=True) as s, _ingest_lock(doc_id):
+        if open_document(doc_id) is not None:
+            return doc_id
+        timings = {} if timings is None else timings
+        chunks = list(ingest.ingest_pdf(file_bytes, timings, workers))
+        engine = _build_engine(chunks, timings)
+        index_cache.save_index(doc_id, BACKEND, chunks, engine)
+        _remember(doc_id, (chunks, engine))
+        s.set(cache_hit=False, pages=timings.get("pages", 0), chunks=len(chunks),
+              extract_s=timings.get("extract", 0.0), split_s=timings.get("split", 0.0))
+    return doc_id
+
+def document_chunks(file_bytes, timings=None, workers=ingest.INGEST_WORKERS):
+    """(doc_id, chunks) for a PDF, without building a retrieval engine.
+
+    Chunks come from the shared store if another app already ingested the file, and
+    otherwise stream from the parser page by page; `timings` is filled in as they do.
+    Streamed chunks are stored once they have all been read."""
+    doc_id = index_cache.document_hash(file_bytes)
+    document = open_document(doc_id)
+    if document is not None:
+        return doc_id, document[0]
+    return doc_id, index_cache.stream_chunks(doc_id, BACKEND, ingest.ingest_pdf(file_bytes, timings, workers))
+
+def _engine(doc_id):
+    # Documents stored by `document_chunks` get their engine on the first search
+    with _ingest_lock(doc_id):
+        chunks, engine = open_document(doc_id)
+        if engine is None:
+            engine = _build_engine(chunks, {})
+            index_cache.save_engine(doc_id, BACKEND, engine)
+            _remember(doc_id, (chunks, engine))
+    return engine
+
+def get_chunks(doc_id):
+    document = open_document(doc_id)
+    if document is None:
+        raise KeyError(f"Unknown document {doc_id}")
+    return document[0]
+
+def search(doc_id, query, k=3):
+    """Top chunks of one document as dicts with text, page, chunk_id and score"""
+    with span("search", backend=BACKEND, k=k) as s:
+        document = open_document(doc_id)
+        if document is None:
+            raise KeyError(f"Unknown document {doc_id}")
+        chunks, engine = document
+        if engine is None and chunks:
+            engine = _engine(doc_id)
+        hits = [{**chunks[i], "chunk_id": i, "score": score} for i, score in engine.search(query, k)] if chunks else []
+        s.set(hits=len(hits))
+        return hits
@@ -1,12 +1,17 @@
 import streamlit as st
-from groq import Groq
 from dotenv import load_dotenv
-import os
+from llm import stream_chat, format_stats
+from response_cache import get_cache, format_cache_stats
+from llm_client import get_client, format_client_stats
+from tracing import start_trace, trace_rows
+from token_budget import trim_history
 
 load_dotenv()
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+client = get_client()
+cache = get_cache()
 
+start_trace("first_call")
 st.title("🤖 Milan's AI Chatbot")
 
 if "messages" not in st.session_state:
@@ -22,11 +27,13 @@ if prompt := st.chat_input("Ask me anything..."):
         st.markdown(prompt)
 
     with st.chat_message("assistant"):
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=st.session_state.messages
-        )
-        reply = response.choices[0].message.content
-        st.markdown(reply)
+        stats = {}
+        reply = st.write_stream(stream_chat(client, trim_history(st.session_state.messages), stats=stats, cache=cache))
+        st.caption(format_stats(stats))
 
     st.session_state.messages.append({"role": "assistant", "content": reply})
+
+st.sidebar.caption(format_cache_stats(cache))
+st.sidebar.caption(format_client_stats(client))
+with st.sidebar.expander("⏱ Performance (this run)"):
+    st.dataframe(trace_rows(), hide_index=True, use_container_width=True)
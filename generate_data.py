@@ -1,37 +1,166 @@
-import pandas as pd
-import numpy as np
+"""Synthetic sales and supply chain data for the dashboards, at any scale.
+
+The defaults produce files shaped like the shipped 144-row sales and 300-row supply chain
+data. Larger runs add regions/products/suppliers/categories (or set --rows and let the
+generator size them), and rows are generated and written in vectorized chunks so memory
+stays flat. The dashboards read the CSVs; --format parquet is meant for benchmarks and
+is refused for the dashboards' data/ directory, where data_backend keeps its own Parquet
+copy of each CSV under the same name.
+
+Planted patterns for the AI analyst to find:
+- South underperforms in Q3 (revenue x0.7 in July-September)
+- SupplierC has a delivery crisis in April-June (~65% delivery, stockouts, slow, poor quality)
+- SupplierE is chronically unreliable (~75% delivery, frequent stockouts)
+
+    python generate_data.py                                     # the shipped files
+    python generate_data.py --rows 10000000 --out-dir /tmp/load  # load-test extracts
+"""
+import argparse
+import math
 import os
+import numpy as np
+import pandas as pd
+
+REGION_BASE = {'North': 50000, 'South': 35000, 'East': 45000, 'West': 40000}
+PRODUCT_MULT = {'Product A': 1.2, 'Product B': 0.9, 'Product C': 1.0}
+SUPPLIERS = ['SupplierA', 'SupplierB', 'SupplierC', 'SupplierD', 'SupplierE']
+CATEGORIES = ['Raw Materials', 'Packaging', 'Components', 'Chemicals', 'Equipment']
+DASHBOARD_DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+
+def entity_names(defaults, count, prefix):
+    names = list(defaults)[:count]
+    return names + [f"{prefix} {i}" for i in range(len(names) + 1, count + 1)]
+
+def _grid(shape, chunk_rows):
+    """Yield index arrays for each grid axis, chunk by chunk in row-major order"""
+    total = math.prod(shape)
+    for start in range(0, total, chunk_rows):
+        yield np.unravel_index(np.arange(start, min(start + chunk_rows, total)), shape)
+
+def sales_chunks(months, regions, products, rng, chunk_rows):
+    # Regions and products beyond the named defaults get random but fixed parameters
+    params = np.random.default_rng(7)
+    base = np.array([REGION_BASE.get(r, 0) or params.uniform(30000, 55000) for r in regions])
+    mult = np.array([PRODUCT_MULT.get(p, 0) or params.uniform(0.8, 1.3) for p in products])
+    labels = np.array([m.strftime('%Y-%m') for m in months])
+    calendar_month = np.array([m.month for m in months])
+    south = regions.index('South') if 'South' in regions else -1
+    region_names, product_names = np.array(regions), np.array(products)
+
+    for m, r, p in _grid((len(months), len(regions), len(products)), chunk_rows):
+        n = len(m)
+        trend = 1 + (calendar_month[m] - 1) * 0.02
+        expected = base[r] * mult[p] * trend
+        noise = rng.uniform(0.85, 1.15, n)
+        # South underperforms in Q3 — a pattern for AI to find
+        noise[(r == south) & np.isin(calendar_month[m], [7, 8, 9])] *= 0.7
+        revenue = expected * noise
+        yield pd.DataFrame({
+            'month': labels[m],
+            'region': region_names[r],
+            'product': product_names[p],
+            'revenue': revenue.round(2),
+            'units_sold': (revenue / rng.uniform(80, 120, n)).astype('int64'),
+            'target': expected.round(2),
+        })
+
+def supply_chain_chunks(months, suppliers, categories, rng, chunk_rows):
+    labels = np.array([m.strftime('%Y-%m') for m in months])
+    calendar_month = np.array([m.month for m in months])
+    crisis = suppliers.index('SupplierC') if 'SupplierC' in suppliers else -1
+    unreliable = suppliers.index('SupplierE') if 'SupplierE' in suppliers else -1
+    supplier_names, category_names = np.array(suppliers), np.array(categories)
+
+    for m, s, c in _grid((len(months), len(suppliers), len(categories)), chunk_rows):
+        n = len(m)
+        delivery = rng.uniform(87, 97, n)
+        lead_time = rng.integers(3, 21, n)
+        quality = delivery + rng.uniform(-8, 8, n)
+        stockout = np.zeros(n, dtype='int64')
+
+        # SupplierC delivery crisis in Q2
+        in_crisis = (s == crisis) & np.isin(calendar_month[m], [4, 5, 6])
+        k = int(in_crisis.sum())
+        delivery[in_crisis] = rng.uniform(61, 70, k)
+        lead_time[in_crisis] += rng.integers(5, 10, k)
+        quality[in_crisis] = rng.uniform(60, 74, k)
+        stockout[in_crisis] = 1
+
+        # SupplierE is unreliable all year
+        chronic = s == unreliable
+        k = int(chronic.sum())
+        delivery[chronic] = rng.uniform(70, 80, k)
+        quality[chronic] = delivery[chronic] + rng.uniform(-10, 10, k)
+        stockout[chronic] = rng.random(k) < 0.5
+
+        delivery = delivery.round(1)
+        yield pd.DataFrame({
+            'month': labels[m],
+            'supplier': supplier_names[s],
+            'category': category_names[c],
+            'delivery_rate': delivery,
+            'lead_time_days': lead_time,
+            'order_value': rng.uniform(5000, 50000, n).round(2),
+            'stockout_incident': stockout,
+            'quality_score': quality.clip(60, 100).round(1),
+            'on_time': (delivery >= 90).astype('int64'),
+        })
+
+def write_chunks(chunks, path, fmt):
+    rows, writer = 0, None
+    try:
+        for i, chunk in enumerate(chunks):
+            if fmt == 'parquet':
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression='zstd')
+                writer.write_table(table)
+            else:
+                chunk.to_csv(path, mode='w' if i == 0 else 'a', header=(i == 0), index=False)
+            rows += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--dataset', choices=['sales', 'supply_chain', 'both'], default='both')
+    parser.add_argument('--start', default='2024-01-01', help='first month')
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--regions', type=int, default=len(REGION_BASE))
+    parser.add_argument('--products', type=int, default=len(PRODUCT_MULT))
+    parser.add_argument('--suppliers', type=int, default=len(SUPPLIERS))
+    parser.add_argument('--categories', type=int, default=len(CATEGORIES))
+    parser.add_argument('--rows', type=int, help='approximate rows per dataset; sizes regions and suppliers to fit')
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000)
+    parser.add_argument('--format', choices=['csv', 'parquet'], default='csv')
+    parser.add_argument('--out-dir', default='data')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    if args.format == 'parquet' and os.path.realpath(args.out_dir) == os.path.realpath(DASHBOARD_DATA_DIR):
+        parser.error("--format parquet would overwrite the dashboards' Parquet cache in data/; pass another --out-dir")
+
+    if args.rows:
+        args.regions = max(args.regions, math.ceil(args.rows / (args.months * args.products)))
+        args.suppliers = max(args.suppliers, math.ceil(args.rows / (args.months * args.categories)))
+
+    months = pd.date_range(args.start, periods=args.months, freq='ME')
+    rng = np.random.default_rng(args.seed)
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    if args.dataset in ('sales', 'both'):
+        path = os.path.join(args.out_dir, f'sales_data.{args.format}')
+        chunks = sales_chunks(months, entity_names(REGION_BASE, args.regions, 'Region'),
+                              entity_names(PRODUCT_MULT, args.products, 'Product'), rng, args.chunk_rows)
+        print(f"Generated {write_chunks(chunks, path, args.format):,} rows of sales data → {path}")
+    if args.dataset in ('supply_chain', 'both'):
+        path = os.path.join(args.out_dir, f'supply_chain_data.{args.format}')
+        chunks = supply_chain_chunks(months, entity_names(SUPPLIERS, args.suppliers, 'Supplier'),
+                                     entity_names(CATEGORIES, args.categories, 'Category'), rng, args.chunk_rows)
+        print(f"Generated {write_chunks(chunks, path, args.format):,} rows of supply chain data → {path}")
 
-np.random.seed(42)
-
-months = pd.date_range('2024-01-01', periods=12, freq='ME')
-regions = ['North', 'South', 'East', 'West']
-products = ['Product A', 'Product B', 'Product C']
-
-rows = []
-for month in months:
-    for region in regions:
-        for product in products:
-            base = {'North': 50000, 'South': 35000, 'East': 45000, 'West': 40000}[region]
-            prod_mult = {'Product A': 1.2, 'Product B': 0.9, 'Product C': 1.0}[product]
-            trend = 1 + (month.month - 1) * 0.02
-            noise = np.random.uniform(0.85, 1.15)
-            # South underperforms in Q3 — a pattern for AI to find
-            if region == 'South' and month.month in [7, 8, 9]:
-                noise *= 0.7
-            revenue = base * prod_mult * trend * noise
-            units = int(revenue / np.random.uniform(80, 120))
-            rows.append({
-                'month': month.strftime('%Y-%m'),
-                'region': region,
-                'product': product,
-                'revenue': round(revenue, 2),
-                'units_sold': units,
-                'target': round(base * prod_mult * trend, 2)
-            })
-
-df = pd.DataFrame(rows)
-os.makedirs('data', exist_ok=True)
-df.to_csv('data/sales_data.csv', index=False)
-print(f"Generated {len(df)} rows of sales data")
-print(df.head())
+if __name__ == '__main__':
+    main()
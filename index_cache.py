@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+import pickle
+import shutil
+import sqlite3
+import tempfile
+from contextlib import contextmanager
+import retrieval
+
+# Persistent store behind document_service.py, shared by every app and process. Each entry is a
+# directory named after the PDF's SHA-256 and the retrieval backend, holding the chunks (text
+# and page) and the retrieval engine (its FAISS index, if any, via faiss.write_index). The
+# engine is optional: chunks streamed to an app with its own index are stored on their own,
+# and the engine is added to the entry when the document is first searched.
+# Map-reduce summaries of a document are kept the same way, in a "<hash>-summaries" entry.
+# Entries are evicted least-recently-used first once the store grows past INDEX_CACHE_MAX_MB.
+# Hit/miss/eviction counters are rows in a small SQLite file, each bumped by one upsert, so
+# concurrent processes never lose counts or read a half-written file.
+CACHE_DIR = os.getenv("INDEX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".index_cache"))
+MAX_CACHE_BYTES = int(os.getenv("INDEX_CACHE_MAX_MB", "512")) * 1024 * 1024
+METRICS_DB = os.path.join(CACHE_DIR, "metrics.sqlite")
+
+_metrics_ready = False
+
+def document_hash(file_bytes):
+    return hashlib.sha256(file_bytes).hexdigest()
+
+def _entry_dir(doc_hash, backend):
+    return os.path.join(CACHE_DIR, f"{doc_hash}-{backend}")
+
+@contextmanager
+def _metrics():
+    global _metrics_ready
+    if not _metrics_ready:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+    db = sqlite3.connect(METRICS_DB, timeout=10)
+    try:
+        # The schema and WAL mode are set up once per process; both persist in the file
+        if not _metrics_ready:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("CREATE TABLE IF NOT EXISTS metrics (event TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+            _metrics_ready = True
+        with db:
+            yield db
+    finally:
+        db.close()
+
+def _record(event):
+    with _metrics() as db:
+        db.execute("INSERT INTO metrics VALUES (?, 1) ON CONFLICT(event) DO UPDATE SET count = count + 1", (event,))
+
+def cache_stats():
+    """Hit/miss/eviction counters accumulated across processes"""
+    with _metrics() as db:
+        return {"hits": 0, "misses": 0, "evictions": 0, **dict(db.execute("SELECT event, count FROM metrics").fetchall())}
+
+def load_index(doc_hash, backend):
+    """Return (chunks, engine) for a cached document, or None on a miss; engine is None if not built yet"""
+    path = _entry_dir(doc_hash, backend)
+    try:
+        with open(os.path.join(path, "chunks.json"), 'r') as f:
+            chunks = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        _record("misses")
+        return None
+    try:
+        engine = retrieval.load_engine(path)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError, RuntimeError):
+        engine = None
+    # Touch the entry so eviction sees it as recently used
+    os.utime(path)
+    _record("hits")
+    return chunks, engine
+
+def _publish(tmp_dir, path):
+    try:
+        os.rename(tmp_dir, path)
+    except OSError:
+        # Another process stored the same document first
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    evict()
+
+def save_index(doc_hash, backend, chunks, engine=None):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    # Write into a scratch directory first so readers never see a half-written entry
+    tmp_dir = tempfile.mkdtemp(dir=CACHE_DIR, prefix=".tmp-")
+    with open(os.path.join(tmp_dir, "chunks.json"), 'w') as f:
+        json.dump(chunks, f)
+    if engine is not None:
+        retrieval.save_engine(engine, tmp_dir)
+    _publish(tmp_dir, _entry_dir(doc_hash, backend))
+
+def stream_chunks(doc_hash, backend, chunks):
+    """Yield `chunks` while writing them to a new entry without an engine.
+
+    The entry only appears once every chunk is written; if the consumer stops early,
+    nothing is stored."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=CACHE_DIR, prefix=".tmp-")
+    try:
+        with open(os.path.join(tmp_dir, "chunks.json"), 'w') as f:
+            f.write("[")
+            for i, chunk in enumerate(chunks):
+                f.write(("," if i else "") + json.dumps(chunk))
+                yield chunk
+            f.write("]")
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    _publish(tmp_dir, _entry_dir(doc_hash, backend))
+
+def save_engine(doc_hash, backend, engine):
+    """Add a retrieval engine to a stored entry that has none"""
+    path = _entry_dir(doc_hash, backend)
+    if not os.path.isdir(path):
+        return
+    tmp_dir = tempfile.mkdtemp(dir=CACHE_DIR, prefix=".tmp-")
+    try:
+        retrieval.save_engine(engine, tmp_dir)
+        # engine.pkl goes in last, so a reader that finds it also finds its FAISS index
+        for name in sorted(os.listdir(tmp_dir), key=lambda name: name == "engine.pkl"):
+            os.replace(os.path.join(tmp_dir, name), os.path.join(path, name))
+    except FileNotFoundError:
+        # The entry was evicted meanwhile
+        pass
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    evict()
+
+def load_summaries(doc_hash):
+    """Intermediate summaries stored for a document, keyed by the hash of their input"""
+    path = _entry_dir(doc_hash, "summaries")
+    try:
+        with open(os.path.join(path, "summaries.json"), 'r') as f:
+            summaries = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    os.utime(path)
+    return summaries
+
+def save_summaries(doc_hash, summaries):
+    path = _entry_dir(doc_hash, "summaries")
+    os.makedirs(path, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path, prefix=".tmp-")
+    with os.fdopen(fd, 'w') as f:
+        json.dump(summaries, f)
+    os.replace(tmp_path, os.path.join(path, "summaries.json"))
+    evict()
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+def evict(max_bytes=MAX_CACHE_BYTES):
+    """Delete least-recently-used entries until the store fits in max_bytes"""
+    entries = []
+    for name in os.listdir(CACHE_DIR):
+        path = os.path.join(CACHE_DIR, name)
+        if os.path.isdir(path) and not name.startswith("."):
+            entries.append((os.path.getmtime(path), _dir_size(path), path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        _record("evictions")
@@ -0,0 +1,93 @@
+import io
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# Streaming PDF ingestion shared by the document apps. The PDF is read from an in-memory
+# buffer (no temp files), pages are extracted in a process pool with a bounded window of
+# in-flight page ranges, and chunks are yielded page by page so callers can index them in
+# batches. Stage timings are accumulated into the `timings` dict passed in. pypdf and the
+# LangChain splitter are imported on first use, not when an app starts. Workers are
+# started by a fork server (spawned where there is none), never forked from the app
+# process itself: forking a multithreaded Streamlit server can copy a lock held by another
+# thread into the child and deadlock it.
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+PAGES_PER_TASK = 8
+# Below this many pages, starting worker processes costs more than it saves
+POOL_MIN_PAGES = 32
+
+_reader = None
+_start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def _init_worker(file_bytes):
+    global _reader
+    from pypdf import PdfReader
+    _reader = PdfReader(io.BytesIO(file_bytes))
+
+def _extract_range(start, end, reader=None):
+    reader = reader or _reader
+    return [(i + 1, reader.pages[i].extract_text() or "") for i in range(start, end)]
+
+def _add_time(timings, stage, started):
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def iter_pages(file_bytes, workers=INGEST_WORKERS, timings=None):
+    """Yield (page_number, text) in page order, numbering pages from 1"""
+    from pypdf import PdfReader
+    timings = {} if timings is None else timings
+    started = time.perf_counter()
+    reader = PdfReader(io.BytesIO(file_bytes))
+    n_pages = len(reader.pages)
+    timings["pages"] = n_pages
+    ranges = [(s, min(s + PAGES_PER_TASK, n_pages)) for s in range(0, n_pages, PAGES_PER_TASK)]
+    _add_time(timings, "extract", started)
+
+    if workers <= 1 or n_pages < POOL_MIN_PAGES:
+        for start, end in ranges:
+            started = time.perf_counter()
+            pages = _extract_range(start, end, reader)
+            _add_time(timings, "extract", started)
+            yield from pages
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(_start_method),
+                             initializer=_init_worker, initargs=(file_bytes,)) as pool:
+        remaining = iter(ranges)
+        pending = deque(pool.submit(_extract_range, *r) for r in islice(remaining, workers * 2))
+        while pending:
+            started = time.perf_counter()
+            pages = pending.popleft().result()
+            _add_time(timings, "extract", started)
+            next_range = next(remaining, None)
+            if next_range:
+                pending.append(pool.submit(_extract_range, *next_range))
+            yield from pages
+
+def iter_chunks(pages, chunk_size=500, chunk_overlap=50, timings=None):
+    """Split each page as it arrives, yielding {"text": ..., "page": ...} chunks"""
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    timings = {} if timings is None else timings
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    timings.setdefault("chunks", 0)
+    for page, text in pages:
+        started = time.perf_counter()
+        pieces = splitter.split_text(text)
+        _add_time(timings, "split", started)
+        timings["chunks"] += len(pieces)
+        for piece in pieces:
+            yield {"text": piece, "page": page}
+
+def ingest_pdf(file_bytes, timings=None, workers=INGEST_WORKERS):
+    return iter_chunks(iter_pages(file_bytes, workers, timings), timings=timings)
+
+def format_timings(timings):
+    stages = " · ".join(f"{stage} {timings[stage]:.2f}s" for stage in ("extract", "split", "index") if stage in timings)
+    return f"{timings.get('pages', 0)} pages → {timings.get('chunks', 0)} chunks · {stages}"
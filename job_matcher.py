@@ -1,45 +1,108 @@
 import streamlit as st
-from groq import Groq
 from dotenv import load_dotenv
+from response_cache import get_cache, format_cache_stats
+from llm_client import get_client, format_client_stats
+from tracing import span, start_trace, trace_rows
+from token_budget import message_tokens, truncate
 import os
-import json
 import datetime
+import time
+import application_store
+import job_queue
+import batch_matcher
+from batch_matcher import DEFAULT_SYSTEM, DOCUMENT_TOKEN_BUDGET, MAX_CONCURRENT_CALLS, analysis_prompt, prompt_messages
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-
-def ask(prompt, system="You are an expert recruiter and career coach. Be specific, direct and actionable."):
-    return client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=[{"role": "system", "content": system}, {"role": "user", "content": prompt}]
-    ).choices[0].message.content
-
-# Load/save tracker
-TRACKER_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data/applications.json")
-
-def load_applications():
-    if os.path.exists(TRACKER_FILE):
-        with open(TRACKER_FILE, 'r') as f:
-            return json.load(f)
-    return []
-
-def save_application(app):
-    apps = load_applications()
-    apps.append(app)
-    os.makedirs(os.path.dirname(TRACKER_FILE), exist_ok=True)
-    with open(TRACKER_FILE, 'w') as f:
-        json.dump(apps, f, indent=2)
-
-def update_application(index, updates):
-    apps = load_applications()
-    apps[index].update(updates)
-    with open(TRACKER_FILE, 'w') as f:
-        json.dump(apps, f, indent=2)
+client = get_client()
+cache = get_cache()
+
+TRACKER_PAGE_SIZE = int(os.getenv("TRACKER_PAGE_SIZE", "20"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# A job with no step started or finished for this long stops being polled
+JOB_WAIT_SECONDS = float(os.getenv("JOB_WAIT_SECONDS", "300"))
+
+@st.cache_resource
+def get_runner():
+    # One pool per process: steps keep running through reruns and browser refreshes
+    return job_queue.JobRunner(batch_matcher.llm_step, workers=MAX_CONCURRENT_CALLS)
+
+def submit_package(calls, meta):
+    """Queue independent (key, label, prompt, system) calls as one background job"""
+    steps = [(key, label, {"messages": prompt_messages(prompt, system)}) for key, label, prompt, system in calls]
+    tokens = {key: message_tokens(payload["messages"]) for key, _, payload in steps}
+    return get_runner().submit("package", steps, meta={**meta, "tokens": tokens})
+
+def job_active(job):
+    """Unfinished, and some step has moved within JOB_WAIT_SECONDS, so still worth polling"""
+    last_change = max(step["updated"] for step in job["steps"])
+    return job["status"] not in job_queue.FINISHED and time.time() - last_change < JOB_WAIT_SECONDS
+
+def draw_job(job, name):
+    """A job's steps in an st.status box, as they stand now"""
+    tokens = job["meta"].get("tokens", {})
+    failed = [step["label"] for step in job["steps"] if step["status"] == "failed"]
+    if job["status"] in job_queue.FINISHED:
+        if failed:
+            label, state = f"{name} ready — {len(failed)} step(s) failed: {', '.join(failed)}", "error"
+        else:
+            label, state = f"{name} ready — {sum(tokens.values()):,} prompt tokens sent", "complete"
+    elif job_active(job):
+        done = sum(step["status"] in job_queue.FINISHED for step in job["steps"])
+        label, state = f"Generating your {name.lower()}... {done}/{len(job['steps'])}", "running"
+    else:
+        label, state = f"{name} has made no progress for {JOB_WAIT_SECONDS / 60:.0f} minutes — refresh to check again", "error"
+    with st.status(label, state=state, expanded=state == "running"):
+        for step in job["steps"]:
+            if step["status"] == "done":
+                st.markdown(f"✅ {step['label']} · {tokens.get(step['step'], 0):,} prompt tokens")
+            elif step["status"] == "failed":
+                st.markdown(f"❌ {step['label']} failed")
+            else:
+                st.markdown(f"⏳ {step['label']}...")
+
+def follow_job(job_id, name):
+    # Runs as a fragment, so only this box reruns on each poll while the rest of the page stays usable
+    job = get_runner().get_job(job_id)
+    draw_job(job, name)
+    if not job_active(job):
+        # A full rerun draws what depends on the finished job, and stops the polling
+        st.rerun()
+
+def show_job(job_id, name):
+    """Draw a job, polling it every JOB_POLL_SECONDS while it runs; the job, or None if unknown"""
+    job = get_runner().get_job(job_id)
+    if job is None:
+        return None
+    if job_active(job):
+        st.fragment(follow_job, run_every=JOB_POLL_SECONDS)(job_id, name)
+    else:
+        draw_job(job, name)
+    return job
+
+def package_results(job):
+    """Finished steps' texts by key, plus the failed steps' errors under 'failed'"""
+    results = {step["step"]: step["result"] for step in job["steps"] if step["status"] == "done"}
+    results['failed'] = {step["step"]: f"{step['label']} failed: {step['error']}" for step in job["steps"] if step["status"] == "failed"}
+    meta = job["meta"]
+    return {**results, **{field: meta.get(field, "") for field in ("company", "title", "url", "cv", "jd")}}
+
+def show_result(results, key):
+    if key in results:
+        st.markdown(results[key])
+    else:
+        st.warning(results['failed'][key])
+
+@st.cache_resource
+def open_tracker():
+    # Creates the tables (and imports any old applications.json) once per process
+    application_store.init_store()
 
 st.set_page_config(page_title="Job Application Assistant", page_icon="🎯", layout="wide")
+start_trace("job_matcher")
+open_tracker()
 
 # Tabs
-tab_main, tab_tracker = st.tabs(["🎯 Application Assistant", "📋 Application Tracker"])
+tab_main, tab_batch, tab_tracker = st.tabs(["🎯 Application Assistant", "📦 Batch Screening", "📋 Application Tracker"])
 
 with tab_main:
     st.title("🎯 Job Application Assistant")
@@ -68,21 +131,11 @@ with tab_main:
         if not cv_text or not jd_text:
             st.error("Please paste both your CV and the job description.")
         else:
-            with st.spinner("Analysing match..."):
-                analysis = ask(f"""Analyse this CV against this job description.
-
-CV: {cv_text}
-
-Job Description: {jd_text}
-
-Provide exactly:
-1. MATCH SCORE (0-100) with one line explanation
-2. TOP 3 STRENGTHS
-3. TOP 3 GAPS
-4. ONE SENTENCE SUMMARY of what the hiring manager will think""")
-
-            with st.spinner("Running ATS check..."):
-                ats = ask(f"""You are an ATS system. Analyse this CV against this job description.
+            cv_text = truncate(cv_text, DOCUMENT_TOKEN_BUDGET)
+            jd_text = truncate(jd_text, DOCUMENT_TOKEN_BUDGET)
+            calls = [
+                ("analysis", "Analysing match", analysis_prompt(cv_text, jd_text), DEFAULT_SYSTEM),
+                ("ats", "Running ATS check", f"""You are an ATS system. Analyse this CV against this job description.
 
 CV: {cv_text}
 
@@ -93,10 +146,9 @@ Provide:
 2. CRITICAL KEYWORDS MISSING
 3. KEYWORDS PRESENT
 4. FORMAT ISSUES
-5. QUICK FIXES — 3 specific changes to improve ATS score immediately""")
-
-            with st.spinner("Rewriting CV..."):
-                rewrite = ask(f"""Rewrite this candidate's CV professional summary and 5 bullet points tailored for this job.
+5. QUICK FIXES — 3 specific changes to improve ATS score immediately""",
+                 DEFAULT_SYSTEM),
+                ("rewrite", "Rewriting CV", f"""Rewrite this candidate's CV professional summary and 5 bullet points tailored for this job.
 
 CV: {cv_text}
 
@@ -104,10 +156,9 @@ Job Description: {jd_text}
 
 Provide:
 1. REWRITTEN PROFESSIONAL SUMMARY (3 sentences, mirror JD language, include metrics)
-2. 5 REWRITTEN BULLET POINTS (strong action verbs, numbers, mirror JD keywords)""")
-
-            with st.spinner("Predicting interview questions..."):
-                questions = ask(f"""Based on this job description and CV, predict the 8 most likely interview questions.
+2. 5 REWRITTEN BULLET POINTS (strong action verbs, numbers, mirror JD keywords)""",
+                 DEFAULT_SYSTEM),
+                ("questions", "Predicting interview questions", f"""Based on this job description and CV, predict the 8 most likely interview questions.
 
 CV: {cv_text}
 
@@ -116,10 +167,9 @@ Job Description: {jd_text}
 For each question provide:
 - The question
 - Why they will ask it
-- Strong answer framework using the candidate's actual experience""")
-
-            with st.spinner("Writing cold email..."):
-                email = ask(f"""Write a cold email from this candidate to the hiring manager.
+- Strong answer framework using the candidate's actual experience""",
+                 DEFAULT_SYSTEM),
+                ("email", "Writing cold email", f"""Write a cold email from this candidate to the hiring manager.
 
 CV: {cv_text}
 
@@ -133,10 +183,8 @@ Rules:
 - One concrete achievement
 - Clear call to action
 - No generic phrases""",
-system="You are an expert at writing cold emails that get responses. Be punchy and specific.")
-
-            with st.spinner("Writing cover letter..."):
-                cover_letter = ask(f"""Write a outstanding cover letter for this candidate for this specific role.
+                 "You are an expert at writing cold emails that get responses. Be punchy and specific."),
+                ("cover_letter", "Writing cover letter", f"""Write a outstanding cover letter for this candidate for this specific role.
 
 CV: {cv_text}
 
@@ -167,22 +215,34 @@ Rules:
 - Sound confident not desperate
 - Maximum 400 words
 - Professional British English""",
-system="You are an elite cover letter writer who has helped candidates get hired at top companies. Write cover letters that make hiring managers stop and call immediately.")
-
-            # Store results in session state
-            st.session_state.results = {
-                'analysis': analysis,
-                'ats': ats,
-                'rewrite': rewrite,
-                'questions': questions,
-                'email': email,
-                'cover_letter': cover_letter,
-                'company': company_name,
-                'title': job_title,
-                'url': job_url,
-                'cv': cv_text,
-                'jd': jd_text
-            }
+                 "You are an elite cover letter writer who has helped candidates get hired at top companies. Write cover letters that make hiring managers stop and call immediately."),
+            ]
+            # The same inputs map to the same job, so a second click never pays twice
+            job_id = submit_package(calls, {'company': company_name, 'title': job_title, 'url': job_url,
+                                            'cv': cv_text, 'jd': jd_text})
+            st.session_state.job_id = job_id
+            st.query_params["job"] = job_id
+
+    # The job id in the URL lets a refreshed or reopened page pick the package back up
+    recent = get_runner().recent_jobs("package", limit=5)
+    if recent:
+        with st.expander("🕘 Recent packages"):
+            for job in recent:
+                label = f"{job['meta'].get('company') or 'Unknown'} — {job['meta'].get('title') or 'Untitled'} · {job['status']} · {datetime.datetime.fromtimestamp(job['created']):%Y-%m-%d %H:%M}"
+                if st.button(label, key=f"job_{job['id']}"):
+                    st.session_state.job_id = job['id']
+                    st.query_params["job"] = job['id']
+
+    job_id = st.session_state.get('job_id') or st.query_params.get("job")
+    if job_id and st.session_state.get('results_job') != job_id:
+        job = show_job(job_id, "Application package")
+        if job is None:
+            st.warning("That application package is no longer available — generate it again.")
+            st.session_state.pop('job_id', None)
+            st.query_params.pop("job", None)
+        elif job["status"] in job_queue.FINISHED:
+            st.session_state.results = package_results(job)
+            st.session_state.results_job = job_id
 
     if 'results' in st.session_state:
         r = st.session_state.results
@@ -197,18 +257,18 @@ system="You are an elite cover letter writer who has helped candidates get hired
         ])
 
         with t1:
-            st.markdown(r['analysis'])
+            show_result(r, 'analysis')
         with t2:
-            st.markdown(r['ats'])
+            show_result(r, 'ats')
         with t3:
-            st.markdown(r['rewrite'])
+            show_result(r, 'rewrite')
             st.info("Copy these into your CV before applying.")
         with t4:
-            st.markdown(r['questions'])
+            show_result(r, 'questions')
         with t5:
-            st.markdown(r['email'])
+            show_result(r, 'email')
         with t6:
-            st.markdown(r['cover_letter'])
+            show_result(r, 'cover_letter')
 
         st.divider()
         st.subheader("💾 Save to Tracker")
@@ -218,7 +278,9 @@ system="You are an elite cover letter writer who has helped candidates get hired
         with col2:
             notes = st.text_input("Notes", placeholder="e.g. Applied via LinkedIn, emailed HR")
 
-        if st.button("✅ Save Application", type="primary"):
+        if 'analysis' in r['failed']:
+            st.warning("The match analysis failed, so this package cannot be saved. Generate it again to retry the failed steps.")
+        if st.button("✅ Save Application", type="primary", disabled='analysis' in r['failed']):
             # Extract match score
             try:
                 score_line = [l for l in r['analysis'].split('\n') if 'MATCH SCORE' in l or 'match score' in l.lower()]
@@ -234,26 +296,73 @@ system="You are an elite cover letter writer who has helped candidates get hired
                 'status': status,
                 'match_score': score,
                 'notes': notes,
-                'cold_email': r['email'],
-                'cover_letter': r['cover_letter'],
-                'rewritten_cv': r['rewrite']
+                'cold_email': r.get('email', ''),
+                'cover_letter': r.get('cover_letter', ''),
+                'rewritten_cv': r.get('rewrite', '')
             }
-            save_application(app)
+            application_store.save_application(app)
             st.success(f"✅ Saved! {r['company']} — {r['title']} added to your tracker.")
 
+with tab_batch:
+    st.title("📦 Batch Screening")
+    st.caption("Rank a week's postings against the CV from the Application Assistant tab; only the best go to the LLM.")
+
+    uploads = st.file_uploader("Job descriptions — a CSV, or one .txt/.md file per posting",
+                               type=["csv", "txt", "md"], accept_multiple_files=True)
+    top_n = st.number_input("Postings to analyse with the LLM", min_value=1, max_value=200, value=batch_matcher.BATCH_TOP_N)
+
+    if st.button("🔎 Rank postings"):
+        if not cv_text or not uploads:
+            st.error("Please paste your CV on the Application Assistant tab and upload some job descriptions.")
+        else:
+            try:
+                postings = batch_matcher.postings_from_uploads(uploads)
+                with span("prerank", postings=len(postings)):
+                    st.session_state.batch_ranked = batch_matcher.prerank(cv_text, postings)
+                st.session_state.pop('batch_job', None)
+            except ValueError as e:
+                st.error(str(e))
+
+    if 'batch_ranked' in st.session_state:
+        ranked = st.session_state.batch_ranked
+        if ranked.empty:
+            st.warning("No postings found: the text files are empty, or the CSV's descriptions are all blank.")
+        else:
+            st.dataframe(ranked.drop(columns="jd"), hide_index=True, use_container_width=True)
+            if st.button(f"🤖 Analyse the top {min(top_n, len(ranked))} with the LLM", type="primary"):
+                st.session_state.batch_job = batch_matcher.submit_batch(get_runner(), cv_text, ranked.head(top_n))
+
+    if 'batch_job' in st.session_state:
+        job = show_job(st.session_state.batch_job, "Batch analysis")
+        if job is None:
+            st.session_state.pop('batch_job')
+        elif job["status"] in job_queue.FINISHED:
+            batch = batch_matcher.batch_results(job)
+            st.dataframe(batch[["company", "title", "match_score", "prerank_score", "status", "url"]],
+                         hide_index=True, use_container_width=True)
+            pick = st.selectbox("Read an analysis", range(len(batch)),
+                                format_func=lambda i: f"{batch['company'][i] or 'Unknown'} — {batch['title'][i] or 'Untitled'}")
+            st.markdown(batch['analysis'][pick])
+            if st.session_state.get('batch_saved') == st.session_state.batch_job:
+                st.success("These postings are in your tracker.")
+            elif st.button("💾 Save all to tracker"):
+                saved = application_store.save_applications(batch_matcher.tracker_rows(batch))
+                st.session_state.batch_saved = st.session_state.batch_job
+                st.success(f"✅ Saved {len(saved)} postings to your tracker as To Apply.")
+
 with tab_tracker:
     st.title("📋 Application Tracker")
     st.caption("All your applications in one place.")
 
-    apps = load_applications()
+    counts = application_store.status_counts()
+    total = sum(counts.values())
 
-    if not apps:
+    if not total:
         st.info("No applications saved yet. Generate your first application package and save it.")
     else:
         # Summary metrics
-        total = len(apps)
-        interviews = len([a for a in apps if a['status'] == 'Interview'])
-        offers = len([a for a in apps if a['status'] == 'Offer'])
+        interviews = counts.get('Interview', 0)
+        offers = counts.get('Offer', 0)
         response_rate = round((interviews + offers) / total * 100, 1) if total > 0 else 0
 
         k1, k2, k3, k4 = st.columns(4)
@@ -264,13 +373,46 @@ with tab_tracker:
 
         st.divider()
 
-        # Filter by status
-        status_filter = st.selectbox("Filter by status", ["All", "Applied", "To Apply", "Interview", "Rejected", "Offer"])
-
-        filtered_apps = apps if status_filter == "All" else [a for a in apps if a['status'] == status_filter]
-
-        for i, app in enumerate(reversed(filtered_apps)):
-            idx = len(apps) - 1 - i
+        # Filters run as indexed queries in the store
+        f1, f2, f3 = st.columns(3)
+        with f1:
+            status_filter = st.selectbox("Filter by status", ["All", "Applied", "To Apply", "Interview", "Rejected", "Offer"])
+        with f2:
+            company_filter = st.selectbox("Filter by company", ["All"] + application_store.companies())
+        with f3:
+            since = st.date_input("Applied since", value=None)
+
+        filters = dict(
+            status=None if status_filter == "All" else status_filter,
+            company=None if company_filter == "All" else company_filter,
+            date_from=since.strftime('%Y-%m-%d') if since else None
+        )
+
+        # Only one page of summaries is fetched and rendered, however large the tracker grows.
+        # Pages are keyed on the last id of the page before, kept as a stack per filter set
+        if st.session_state.get('tracker_filters') != filters:
+            st.session_state.tracker_filters = filters
+            st.session_state.tracker_cursors = [None]
+        cursors = st.session_state.tracker_cursors
+        matching = application_store.count_applications(**filters)
+        pages = max(1, -(-matching // TRACKER_PAGE_SIZE))
+        page = len(cursors)
+        filtered_apps = application_store.list_applications(**filters, limit=TRACKER_PAGE_SIZE, before_id=cursors[-1])
+
+        p1, p2, p3 = st.columns([1, 1, 4])
+        with p1:
+            if st.button("← Newer", disabled=page == 1):
+                cursors.pop()
+                st.rerun()
+        with p2:
+            if st.button("Older →", disabled=page >= pages or not filtered_apps):
+                cursors.append(filtered_apps[-1]['id'])
+                st.rerun()
+        with p3:
+            first = (page - 1) * TRACKER_PAGE_SIZE
+            st.caption(f"Showing {min(first + 1, matching)}–{min(first + len(filtered_apps), matching)} of {matching} applications · page {page} of {pages}")
+
+        for app in filtered_apps:
             with st.expander(f"**{app['company']}** — {app['title']} | {app['status']} | {app['date']}"):
                 col1, col2, col3 = st.columns(3)
                 with col1:
@@ -279,28 +421,35 @@ with tab_tracker:
                     st.markdown(f"**Date:** {app['date']}")
                 with col2:
                     st.markdown(f"**Status:** {app['status']}")
-                    st.markdown(f"**Match Score:** {app.get('match_score', 'N/A')}")
+                    st.markdown(f"**Match Score:** {app.get('match_score') or 'N/A'}")
                     if app.get('url'):
                         st.markdown(f"**Job URL:** [Link]({app['url']})")
                 with col3:
-                    st.markdown(f"**Notes:** {app.get('notes', '-')}")
+                    st.markdown(f"**Notes:** {app.get('notes') or '-'}")
 
                 # Update status
                 new_status = st.selectbox(
                     "Update status",
                     ["Applied", "To Apply", "Interview", "Rejected", "Offer"],
                     index=["Applied", "To Apply", "Interview", "Rejected", "Offer"].index(app['status']),
-                    key=f"status_{idx}"
+                    key=f"status_{app['id']}"
                 )
                 if new_status != app['status']:
-                    update_application(idx, {'status': new_status})
+                    application_store.update_application(app['id'], {'status': new_status})
                     st.rerun()
 
-                # Show materials
-                mat1, mat2, mat3 = st.tabs(["📧 Cold Email", "📝 Cover Letter", "✏️ Rewritten CV"])
-                with mat1:
-                    st.markdown(app.get('cold_email', 'Not saved'))
-                with mat2:
-                    st.markdown(app.get('cover_letter', 'Not saved'))
-                with mat3:
-                    st.markdown(app.get('rewritten_cv', 'Not saved'))
+                # The long texts are only read from the store when asked for
+                if st.toggle("Show saved materials", key=f"materials_{app['id']}"):
+                    materials = application_store.get_materials(app['id'])
+                    mat1, mat2, mat3 = st.tabs(["📧 Cold Email", "📝 Cover Letter", "✏️ Rewritten CV"])
+                    with mat1:
+                        st.markdown(materials.get('cold_email') or 'Not saved')
+                    with mat2:
+                        st.markdown(materials.get('cover_letter') or 'Not saved')
+                    with mat3:
+                        st.markdown(materials.get('rewritten_cv') or 'Not saved')
+
+st.sidebar.caption(format_cache_stats(cache))
+st.sidebar.caption(format_client_stats(client))
+with st.sidebar.expander("⏱ Performance (this run)"):
+    st.dataframe(trace_rows(), hide_index=True, use_container_width=True)
@@ -0,0 +1,200 @@
+import hashlib
+import itertools
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from tracing import span
+
+# Background runner for multi-call generation jobs. A job is a list of independent steps,
+# each with a JSON payload; steps run on a process-wide pool of worker threads, outside
+# the Streamlit script thread, so reruns and browser refreshes do not interrupt them.
+# Workers take steps from a priority queue ordered by the payload's "priority" (lower
+# first, see llm.INTERACTIVE), so a package submitted behind a long batch still goes
+# first. Every step's result is written to a SQLite job table the moment it completes,
+# and the UI polls the job by id. Jobs are keyed by a hash of their steps: submitting the
+# same work again returns the existing job instead of paying for it twice. A step that
+# has been "running" for over JOB_STALE_SECONDS (its process died) is queued again by the
+# next submit or get_job, so JOB_STALE_SECONDS must exceed the longest step. Finished
+# jobs are dropped after JOB_RETENTION_DAYS.
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DB_FILE = os.getenv("JOBS_DB", os.path.join(DATA_DIR, "jobs.sqlite"))
+STALE_SECONDS = int(os.getenv("JOB_STALE_SECONDS", "600"))
+RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL UNIQUE,
+    status TEXT NOT NULL,
+    meta TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_kind ON jobs(kind, created);
+CREATE TABLE IF NOT EXISTS job_steps (
+    job_id TEXT NOT NULL REFERENCES jobs(id) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    step TEXT NOT NULL,
+    label TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    updated REAL NOT NULL,
+    PRIMARY KEY (job_id, step)
+);
+"""
+FINISHED = ("done", "failed")
+
+@contextmanager
+def _connect(path):
+    db = sqlite3.connect(path, timeout=10)
+    db.row_factory = sqlite3.Row
+    try:
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA foreign_keys=ON")
+        with db:
+            yield db
+    finally:
+        db.close()
+
+def job_key(kind, steps):
+    """Same kind and same step payloads, same key"""
+    payload = json.dumps([kind, [(step, payload) for step, _, payload in steps]], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class JobRunner:
+    """Runs submitted jobs' steps with `handler(payload) -> str` on `workers` threads"""
+
+    def __init__(self, handler, path=DB_FILE, workers=4):
+        self.handler = handler
+        self.path = path
+        self.queue = queue.PriorityQueue()
+        self.order = itertools.count()
+        self.lock = threading.Lock()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"job-{i}", daemon=True).start()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with _connect(path) as db:
+            db.executescript(SCHEMA)
+            db.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                       (time.time() - RETENTION_DAYS * 86400,))
+        self.resume()
+
+    def submit(self, kind, steps, meta=None):
+        """Queue a job of (step, label, payload) steps and return its id.
+
+        If the same steps were submitted before, that job's id is returned; only its
+        failed and stale steps are queued again, and its meta is replaced by this one."""
+        if not steps:
+            raise ValueError("a job needs at least one step")
+        key = job_key(kind, steps)
+        now = time.time()
+        with self.lock, _connect(self.path) as db:
+            row = db.execute("SELECT id FROM jobs WHERE key = ?", (key,)).fetchone()
+            if row:
+                job_id = row["id"]
+                # Meta is not part of the key (e.g. a corrected company name), so the latest wins
+                if meta is not None:
+                    db.execute("UPDATE jobs SET meta = ? WHERE id = ?", (json.dumps(meta), job_id))
+                requeued = self._requeue(db, job_id, failed=True)
+            else:
+                job_id = uuid.uuid4().hex
+                db.execute("INSERT INTO jobs VALUES (?, ?, ?, 'running', ?, ?, ?)",
+                           (job_id, kind, key, json.dumps(meta or {}), now, now))
+                db.executemany("INSERT INTO job_steps VALUES (?, ?, ?, ?, ?, 'queued', NULL, NULL, ?)",
+                               [(job_id, i, step, label, json.dumps(payload), now) for i, (step, label, payload) in enumerate(steps)])
+                requeued = self._queued(db, job_id)
+        self._schedule(requeued)
+        return job_id
+
+    def resume(self):
+        """Schedule steps that are queued, or were left running by a process that died"""
+        with _connect(self.path) as db:
+            self._requeue(db)
+            self._schedule(self._queued(db))
+
+    def _requeue(self, db, job_id=None, failed=False):
+        """Put stale "running" steps (and, on resubmit, failed ones) back in the queue; returns those steps"""
+        statuses = "('running', 'failed')" if failed else "('running')"
+        stale = f"status IN {statuses} AND (status = 'failed' OR updated < ?)"
+        now = time.time()
+        job_filter, params = ("AND job_id = ?", (job_id,)) if job_id else ("", ())
+        rows = db.execute(f"SELECT job_id, step, COALESCE(json_extract(payload, '$.priority'), 0) AS priority "
+                          f"FROM job_steps WHERE {stale} {job_filter} ORDER BY job_id, position", (now - STALE_SECONDS, *params)).fetchall()
+        # The condition is checked again per step, so a step that finished in between is left alone
+        requeued = [row for row in rows if db.execute(
+            f"UPDATE job_steps SET status = 'queued', error = NULL, updated = ? WHERE job_id = ? AND step = ? AND {stale}",
+            (now, row["job_id"], row["step"], now - STALE_SECONDS)).rowcount]
+        for job in {row["job_id"] for row in requeued}:
+            db.execute("UPDATE jobs SET status = 'running', updated = ? WHERE id = ?", (now, job))
+        return requeued
+
+    def _queued(self, db, job_id=None):
+        job_filter, params = ("AND job_id = ?", (job_id,)) if job_id else ("", ())
+        return db.execute("SELECT job_id, step, COALESCE(json_extract(payload, '$.priority'), 0) AS priority "
+                          f"FROM job_steps WHERE status = 'queued' {job_filter} ORDER BY job_id, position", params).fetchall()
+
+    def _schedule(self, rows):
+        # Scheduling a step twice is harmless: the claim in _run_step runs it once
+        for row in rows:
+            self.queue.put((row["priority"], next(self.order), row["job_id"], row["step"]))
+
+    def _work(self):
+        while True:
+            _, _, job_id, step = self.queue.get()
+            try:
+                self._run_step(job_id, step)
+            except sqlite3.Error:
+                # The step stays "running" and is queued again once it goes stale
+                pass
+
+    def _run_step(self, job_id, step):
+        # Claiming the step in one UPDATE means each step runs once, even across processes
+        with _connect(self.path) as db:
+            claimed = db.execute("UPDATE job_steps SET status = 'running', updated = ? "
+                                 "WHERE job_id = ? AND step = ? AND status = 'queued'", (time.time(), job_id, step))
+            if not claimed.rowcount:
+                return
+            payload = json.loads(db.execute("SELECT payload FROM job_steps WHERE job_id = ? AND step = ?",
+                                            (job_id, step)).fetchone()[0])
+        result, error = None, None
+        with span("job_step", job_id=job_id[:8], step=step):
+            try:
+                result = self.handler(payload)
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+        with _connect(self.path) as db:
+            db.execute("UPDATE job_steps SET status = ?, result = ?, error = ?, updated = ? WHERE job_id = ? AND step = ?",
+                       ("failed" if error else "done", result, error, time.time(), job_id, step))
+            counts = dict(db.execute("SELECT status, COUNT(*) FROM job_steps WHERE job_id = ? GROUP BY status",
+                                     (job_id,)).fetchall())
+            if not counts.get("queued") and not counts.get("running"):
+                db.execute("UPDATE jobs SET status = ?, updated = ? WHERE id = ?",
+                           ("failed" if counts.get("failed") else "done", time.time(), job_id))
+
+    def get_job(self, job_id):
+        """The job with its meta and steps (status, result, error, updated), or None if unknown.
+
+        Polling a job also re-queues its steps that went stale in a process that died."""
+        with _connect(self.path) as db:
+            job = db.execute("SELECT id, kind, status, meta, created, updated FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            if job["status"] == "running":
+                self._schedule(self._requeue(db, job_id))
+            steps = db.execute("SELECT step, label, status, result, error, updated FROM job_steps WHERE job_id = ? ORDER BY position",
+                               (job_id,)).fetchall()
+        return {**dict(job), "meta": json.loads(job["meta"] or "{}"), "steps": [dict(s) for s in steps]}
+
+    def recent_jobs(self, kind, limit=10):
+        with _connect(self.path) as db:
+            rows = db.execute("SELECT id, status, meta, created FROM jobs WHERE kind = ? ORDER BY created DESC LIMIT ?",
+                              (kind, limit)).fetchall()
+        return [{**dict(row), "meta": json.loads(row["meta"] or "{}")} for row in rows]
@@ -0,0 +1,437 @@
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+from ingest import batched
+from tracing import span
+
+# Multi-document knowledge base for the RAG chatbot. Chunks from every document live in
+# FAISS IndexIDMap2 indexes, so a new report is appended with add_with_ids and a removed
+# one is dropped with remove_ids; nothing already indexed is re-encoded. Each chunk id
+# maps to its source document and page for citations.
+#
+# Retrieval is hybrid: a hashed BM25 index always, plus local sentence-transformers
+# embeddings when KB_DENSE_MODEL is available. The two rankings are merged with
+# reciprocal rank fusion, and KB_RERANK_MODEL optionally re-scores the fused top
+# KB_RERANK_TOP_N with a cross-encoder. Chunk embeddings are cached by content hash, so
+# re-adding a document or rebuilding the index does not run the model again.
+#
+# KB_VECTOR_STORAGE picks how both indexes hold their vectors: "flat" float32, "fp16"
+# (half the memory) or "sq8" 8-bit scalar codes (a quarter). The quantizers are trained
+# on each encoder's fixed value range rather than on data, so they are ready before the
+# first document and stay valid as documents come and go.
+#
+# faiss is imported by the functions that build, save and load the indexes, and the
+# embedding model is only loaded for the first add or search (or to open a store that
+# already holds embeddings), so the chatbot's first render does not wait for either.
+KB_DIR = os.getenv("KNOWLEDGE_BASE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".knowledge_base"))
+DENSE_MODEL = os.getenv("KB_DENSE_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+RERANK_MODEL = os.getenv("KB_RERANK_MODEL", "")
+RERANK_TOP_N = int(os.getenv("KB_RERANK_TOP_N", "20"))
+VECTOR_STORAGE = os.getenv("KB_VECTOR_STORAGE", "flat")
+STORAGE_TYPES = {"fp16": "QT_fp16", "sq8": "QT_8bit"}
+FUSION_CANDIDATES = 20
+RRF_K = 60
+# Bumped whenever the stored lexical vectors change meaning; older stores are re-encoded on load
+INDEX_VERSION = 2
+
+class HashingEncoder:
+    """Okapi BM25 over a hashed vocabulary, as vectors whose inner product is the score.
+
+    Chunks are stored as saturated term weights and queries as IDF weights. The feature
+    space is fixed, so vectors stay comparable as documents come and go; document
+    frequencies and the average chunk length are updated on add and remove, and a
+    chunk's length is normalised against the average at the time it was added."""
+
+    def __init__(self, dim=2048, k1=1.5, b=0.75):
+        self.dim = dim
+        self.k1 = k1
+        self.b = b
+        self._vectorizer = None
+        self.doc_freq = np.zeros(dim, dtype='int64')
+        self.n_chunks = 0
+        self.total_length = 0
+
+    @property
+    def vectorizer(self):
+        # Built on first use (and never pickled), so opening a saved knowledge base does not import scikit-learn
+        if getattr(self, "_vectorizer", None) is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+            self._vectorizer = HashingVectorizer(n_features=self.dim, stop_words="english", norm=None, alternate_sign=False)
+        return self._vectorizer
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop("vectorizer", None)
+        state["_vectorizer"] = None
+        return state
+
+    @property
+    def value_range(self):
+        # Saturated term weights never exceed k1 + 1
+        return (0.0, self.k1 + 1)
+
+    def update(self, texts, sign=1):
+        counts = self.vectorizer.transform(texts)
+        self.doc_freq += sign * np.bincount(counts.indices, minlength=self.dim)
+        self.n_chunks += sign * len(texts)
+        self.total_length += sign * int(counts.sum())
+
+    def encode(self, texts):
+        counts = self.vectorizer.transform(texts)
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        avg_length = self.total_length / self.n_chunks if self.n_chunks else max(lengths.mean(), 1.0)
+        norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+        counts.data = counts.data * (self.k1 + 1) / (counts.data + norm[rows])
+        return counts.toarray().astype('float32')
+
+    def encode_query(self, query):
+        counts = self.vectorizer.transform([query])
+        doc_freq = self.doc_freq[counts.indices]
+        vector = np.zeros((1, self.dim), dtype='float32')
+        vector[0, counts.indices] = np.log1p((self.n_chunks - doc_freq + 0.5) / (doc_freq + 0.5))
+        return vector
+
+class EmbeddingCache:
+    """Chunk embeddings in SQLite, keyed by a hash of the model name and the chunk text"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def get_many(self, keys):
+        found = {}
+        with self._connect() as db:
+            for batch in batched(keys, 500):
+                rows = db.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({', '.join('?' * len(batch))})", batch)
+                found.update((key, np.frombuffer(vector, dtype='float32')) for key, vector in rows)
+        return found
+
+    def put_many(self, items):
+        with self._connect() as db:
+            db.executemany("INSERT OR IGNORE INTO embeddings VALUES (?, ?)", [(key, vector.tobytes()) for key, vector in items])
+
+class DenseEncoder:
+    """Local sentence-transformers embeddings on CPU, encoded in batches and cached per chunk"""
+
+    value_range = (-1.0, 1.0)  # embeddings are normalised
+
+    def __init__(self, model_name=DENSE_MODEL, batch_size=64, cache_path=None):
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.batch_size = batch_size
+        self.cache = EmbeddingCache(cache_path or os.path.join(KB_DIR, "embeddings.sqlite"))
+
+    def _embed(self, texts):
+        return self.model.encode(texts, batch_size=self.batch_size, normalize_embeddings=True,
+                                 convert_to_numpy=True).astype('float32')
+
+    def encode(self, texts):
+        keys = [hashlib.sha256(f"{self.model_name}\0{text}".encode()).hexdigest() for text in texts]
+        found = self.cache.get_many(keys)
+        missing = [i for i, key in enumerate(keys) if key not in found]
+        if missing:
+            vectors = self._embed([texts[i] for i in missing])
+            fresh = [(keys[i], vector) for i, vector in zip(missing, vectors)]
+            self.cache.put_many(fresh)
+            found.update(fresh)
+        return np.stack([found[key] for key in keys])
+
+    def encode_query(self, query):
+        return self._embed([query])
+
+class Reranker:
+    """Cross-encoder that re-scores (query, chunk) pairs"""
+
+    def __init__(self, model_name=RERANK_MODEL, top_n=RERANK_TOP_N):
+        from sentence_transformers import CrossEncoder
+        self.model = CrossEncoder(model_name, device="cpu")
+        self.top_n = top_n
+
+    def rerank(self, query, hits):
+        if not hits:
+            return hits
+        scores = self.model.predict([(query, hit["text"]) for hit in hits])
+        ranked = sorted(zip(scores.tolist(), range(len(hits))), reverse=True)
+        return [{**hits[i], "score": score} for score, i in ranked]
+
+def dense_encoder():
+    """The configured embedding model, or None when it is disabled or cannot be loaded"""
+    if not DENSE_MODEL:
+        return None
+    try:
+        return DenseEncoder()
+    except (ImportError, OSError):
+        return None
+
+def reranker():
+    if not RERANK_MODEL:
+        return None
+    try:
+        return Reranker()
+    except (ImportError, OSError):
+        return None
+
+def vector_index(encoder, storage=VECTOR_STORAGE):
+    """An empty id-mapped inner-product index holding vectors as flat floats or quantized codes"""
+    import faiss
+    if storage == "flat":
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(encoder.dim))
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"Unknown vector storage '{storage}', expected flat, fp16 or sq8")
+    index = faiss.IndexScalarQuantizer(encoder.dim, getattr(faiss.ScalarQuantizer, STORAGE_TYPES[storage]),
+                                       faiss.METRIC_INNER_PRODUCT)
+    low, high = encoder.value_range
+    index.train(np.array([[low] * encoder.dim, [high] * encoder.dim], dtype='float32'))
+    return faiss.IndexIDMap2(index)
+
+def index_bytes(index):
+    """Memory held by an id-mapped index: its codes plus the two id maps"""
+    if index is None:
+        return 0
+    import faiss
+    code_size = faiss.downcast_index(index.index).code_size
+    return index.ntotal * (code_size + 16)
+
+def reciprocal_rank_fusion(rankings, k=RRF_K):
+    """Merge ranked id lists into [(id, score)], best first"""
+    scores = {}
+    for ranking in rankings:
+        for rank, chunk_id in enumerate(ranking):
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+class KnowledgeBase:
+    """`dense` is an embedding encoder, or a function that makes one (or None), called on the
+    first add or search."""
+
+    def __init__(self, encoder=None, dense=None, reranker=None, storage=VECTOR_STORAGE):
+        self.encoder = encoder or HashingEncoder()
+        self.storage = storage
+        self.index = vector_index(self.encoder, storage)
+        self._make_dense = dense if callable(dense) else None
+        self.dense = None if callable(dense) else dense
+        self.dense_index = vector_index(self.dense, storage) if self.dense else None
+        self.reranker = reranker
+        self.chunks = {}
+        self.documents = {}
+        self.next_id = 0
+        self.pending = set()
+        self.lock = threading.Lock()
+        self.dense_lock = threading.Lock()
+
+    def _load_dense(self):
+        with self.dense_lock:
+            if self._make_dense is None:
+                return
+            dense = self._make_dense()
+            with self.lock:
+                self.dense, self._make_dense = dense, None
+                # Chunks added before the model was loaded are embedded now
+                self._reindex(lexical=False, dense=True)
+
+    @property
+    def retrieval_mode(self):
+        mode = f"hybrid BM25 + {self.dense.model_name.split('/')[-1]}" if self.dense else "BM25"
+        return mode + (" · reranked" if self.reranker else "") + (f" · {self.storage}" if self.storage != "flat" else "")
+
+    def memory_report(self):
+        """Approximate bytes held by each index and by the chunk texts"""
+        with self.lock:
+            return {
+                "lexical": index_bytes(self.index),
+                "dense": index_bytes(self.dense_index),
+                "text": sum(len(c["text"].encode()) for c in self.chunks.values()),
+            }
+
+    def add_document(self, doc_id, name, chunks, batch_size=256, timings=None):
+        """Index a document's chunks, given as an iterable of {"text": ..., "page": ...}.
+
+        Chunks are encoded and added one batch at a time, so a streaming generator is
+        never materialised as a whole; searches can run between batches."""
+        timings = {} if timings is None else timings
+        self._load_dense()
+        with self.lock:
+            if doc_id in self.documents or doc_id in self.pending:
+                return 0
+            self.pending.add(doc_id)
+        ids, pages = [], set()
+        try:
+            for batch in batched(chunks, batch_size):
+                started = time.perf_counter()
+                texts = [c["text"] for c in batch]
+                vectors = self.encoder.encode(texts)
+                dense_vectors = self.dense.encode(texts) if self.dense else None
+                with self.lock:
+                    batch_ids = np.arange(self.next_id, self.next_id + len(batch), dtype='int64')
+                    self.next_id += len(batch)
+                    self.encoder.update(texts)
+                    self.index.add_with_ids(vectors, batch_ids)
+                    if dense_vectors is not None:
+                        self.dense_index.add_with_ids(dense_vectors, batch_ids)
+                    for chunk_id, chunk in zip(batch_ids.tolist(), batch):
+                        self.chunks[chunk_id] = {"doc_id": doc_id, "source": name, "text": chunk["text"], "page": chunk.get("page")}
+                ids.extend(batch_ids.tolist())
+                pages.update(c.get("page") for c in batch)
+                timings["index"] = timings.get("index", 0.0) + time.perf_counter() - started
+            with self.lock:
+                if ids:
+                    self.documents[doc_id] = {"name": name, "chunk_ids": ids, "pages": len(pages)}
+        except Exception:
+            # Roll back the batches already added so a failed upload leaves no orphans
+            with self.lock:
+                self._drop_chunks(ids)
+            raise
+        finally:
+            with self.lock:
+                self.pending.discard(doc_id)
+        return len(ids)
+
+    def _drop_chunks(self, ids):
+        if not ids:
+            return
+        self.encoder.update([self.chunks[i]["text"] for i in ids], sign=-1)
+        self.index.remove_ids(np.array(ids, dtype='int64'))
+        if self.dense_index is not None:
+            self.dense_index.remove_ids(np.array(ids, dtype='int64'))
+        for i in ids:
+            del self.chunks[i]
+
+    def remove_document(self, doc_id):
+        with self.lock:
+            doc = self.documents.pop(doc_id, None)
+            if doc is None:
+                return 0
+            self._drop_chunks(doc["chunk_ids"])
+            return len(doc["chunk_ids"])
+
+    @staticmethod
+    def _ranked(index, vector, n, positive_only):
+        scores, ids = index.search(vector, n)
+        return [i for i, score in zip(ids[0].tolist(), scores[0].tolist()) if i >= 0 and (score > 0 or not positive_only)]
+
+    def _lexical_ranking(self, query_vector, n):
+        # Chunks sharing no term with the query score exactly 0 with flat floats, but 8-bit
+        # codes decode a zero weight as a small positive one, so candidates are checked
+        # against the query's terms instead of trusting the sign of the score
+        ranked = self._ranked(self.index, query_vector, n, positive_only=True)
+        if self.storage == "flat" or not ranked:
+            return ranked
+        terms = np.flatnonzero(query_vector[0])
+        counts = self.encoder.vectorizer.transform([self.chunks[i]["text"] for i in ranked])[:, terms]
+        return [i for i, found in zip(ranked, np.diff(counts.tocsr().indptr)) if found]
+
+    def search(self, query, k=3):
+        """Return the top chunks as dicts with text, source document name, page and score.
+
+        The score is the fused reciprocal-rank score, or the cross-encoder score when
+        reranking is on."""
+        self._load_dense()
+        with span("kb.search", mode=self.retrieval_mode, k=k):
+            dense_query = self.dense.encode_query(query) if self.dense else None
+            with self.lock:
+                if self.index.ntotal == 0:
+                    return []
+                n = min(max(k, FUSION_CANDIDATES, self.reranker.top_n if self.reranker else 0), self.index.ntotal)
+                rankings = [self._lexical_ranking(self.encoder.encode_query(query), n)]
+                if dense_query is not None:
+                    rankings.append(self._ranked(self.dense_index, dense_query, n, positive_only=False))
+                fused = reciprocal_rank_fusion(rankings)
+                hits = [{**self.chunks[i], "score": score} for i, score in fused[:self.reranker.top_n if self.reranker else k]]
+            if self.reranker:
+                with span("rerank", candidates=len(hits)):
+                    hits = self.reranker.rerank(query, hits)
+            return hits[:k]
+
+    def _reindex(self, lexical=True, dense=True, batch_size=256):
+        """Re-encode every stored chunk from its text, e.g. after the encoding changed"""
+        dense = dense and self.dense is not None
+        if not (lexical or dense):
+            return
+        ids = sorted(self.chunks)
+        if lexical:
+            self.encoder = HashingEncoder(self.encoder.dim)
+            self.index = vector_index(self.encoder, self.storage)
+            for batch in batched(ids, batch_size):
+                self.encoder.update([self.chunks[i]["text"] for i in batch])
+        if dense:
+            self.dense_index = vector_index(self.dense, self.storage)
+        for batch in batched(ids, batch_size):
+            texts = [self.chunks[i]["text"] for i in batch]
+            batch_ids = np.array(batch, dtype='int64')
+            if lexical:
+                self.index.add_with_ids(self.encoder.encode(texts), batch_ids)
+            if dense:
+                self.dense_index.add_with_ids(self.dense.encode(texts), batch_ids)
+
+    def save(self, path=KB_DIR):
+        import faiss
+        with self.lock:
+            os.makedirs(path, exist_ok=True)
+            files = ["index.faiss", "encoder.pkl", "metadata.json"]
+            faiss.write_index(self.index, os.path.join(path, "index.faiss.tmp"))
+            if self.dense_index is not None:
+                faiss.write_index(self.dense_index, os.path.join(path, "dense.faiss.tmp"))
+                files.append("dense.faiss")
+            with open(os.path.join(path, "encoder.pkl.tmp"), 'wb') as f:
+                pickle.dump(self.encoder, f)
+            with open(os.path.join(path, "metadata.json.tmp"), 'w') as f:
+                json.dump({"chunks": self.chunks, "documents": self.documents, "next_id": self.next_id,
+                           "version": INDEX_VERSION, "storage": self.storage,
+                           "dense_model": self.dense.model_name if self.dense else None}, f)
+            for name in files:
+                os.replace(os.path.join(path, name + ".tmp"), os.path.join(path, name))
+
+    @classmethod
+    def load(cls, path=KB_DIR, dense=None, reranker=None, storage=VECTOR_STORAGE):
+        """Open the knowledge base stored at path, or start an empty one.
+
+        Stores written by an older version, with another vector storage or with another
+        embedding model are re-encoded from their saved chunk texts."""
+        import faiss
+        if not os.path.exists(os.path.join(path, "metadata.json")):
+            return cls(dense=dense, reranker=reranker, storage=storage)
+        with open(os.path.join(path, "metadata.json"), 'r') as f:
+            metadata = json.load(f)
+        same_storage = metadata.get("storage", "flat") == storage
+        current = metadata.get("version") == INDEX_VERSION and same_storage
+        if current:
+            with open(os.path.join(path, "encoder.pkl"), 'rb') as f:
+                kb = cls(pickle.load(f), dense, reranker, storage)
+            kb.index = faiss.read_index(os.path.join(path, "index.faiss"))
+        else:
+            kb = cls(dense=dense, reranker=reranker, storage=storage)
+        # JSON object keys are strings; chunk ids are ints everywhere else
+        kb.chunks = {int(i): chunk for i, chunk in metadata["chunks"].items()}
+        kb.documents = metadata["documents"]
+        kb.next_id = metadata["next_id"]
+        dense_path = os.path.join(path, "dense.faiss")
+        if kb._make_dense and metadata.get("dense_model") and os.path.exists(dense_path):
+            # The store already holds embeddings, and searching them needs the model
+            kb.dense, kb._make_dense = kb._make_dense(), None
+        dense_current = (bool(kb.dense) and same_storage and metadata.get("dense_model") == kb.dense.model_name
+                         and os.path.exists(dense_path))
+        if dense_current:
+            kb.dense_index = faiss.read_index(dense_path)
+        kb._reindex(lexical=not current, dense=not dense_current)
+        return kb
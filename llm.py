@@ -0,0 +1,110 @@
+import time
+from types import SimpleNamespace
+from token_budget import message_tokens
+from tracing import record, span
+
+MODEL = "llama-3.3-70b-versatile"
+# Scheduling priorities understood by llm_client.LLMClient; lower values are served first
+INTERACTIVE, BACKGROUND = 0, 1
+
+def complete(client, messages, model=MODEL, cache=None, priority=INTERACTIVE):
+    with span("llm.complete", prompt_tokens=message_tokens(messages), cache_hit=False) as s:
+        if cache is not None:
+            hit = cache.get(model, messages)
+            if hit is not None:
+                s.set(cache_hit=hit["match"])
+                return hit["response"]
+        start = time.perf_counter()
+        reply = client.chat.completions.create(model=model, messages=messages, priority=priority).choices[0].message.content
+        if cache is not None:
+            cache.put(model, messages, reply, time.perf_counter() - start)
+        return reply
+
+def stream_chat(client, messages, model=MODEL, stats=None, cache=None, priority=INTERACTIVE):
+    """Yield reply text deltas as they arrive, for use with st.write_stream.
+
+    Timings are written into `stats` (time to first token, tokens/sec, prompt
+    tokens sent). If the stream cannot be opened, or breaks before any text
+    arrived, the reply is fetched in blocking mode instead. With a response cache, a cached reply is
+    yielded at once and fresh replies are stored."""
+    stats = {} if stats is None else stats
+    start = time.perf_counter()
+    stats["prompt_tokens"] = message_tokens(messages)
+    if cache is not None:
+        hit = cache.get(model, messages)
+        if hit is not None:
+            stats.update(cached=hit["match"], saved=hit["latency"], streamed=False)
+            yield hit["response"]
+            stats.update(total=time.perf_counter() - start, tokens=len(hit["response"].split()))
+            stats.update(ttft=stats["total"], tokens_per_sec=0.0)
+            record("llm.stream_chat", start, prompt_tokens=stats["prompt_tokens"], cache_hit=hit["match"])
+            return
+    parts = []
+    try:
+        for chunk in client.chat.completions.create(model=model, messages=messages, stream=True, priority=priority):
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if not delta:
+                continue
+            if not parts:
+                stats["ttft"] = time.perf_counter() - start
+            parts.append(delta)
+            yield delta
+        stats["streamed"] = True
+    except Exception:
+        if parts:
+            raise
+        reply = complete(client, messages, model, priority=priority)
+        stats["ttft"] = time.perf_counter() - start
+        stats["streamed"] = False
+        parts = [reply]
+        yield reply
+    stats["total"] = time.perf_counter() - start
+    stats.setdefault("ttft", stats["total"])
+    stats["tokens"] = len(parts) if stats["streamed"] else len(parts[0].split())
+    # A blocking reply arrives all at once, so its rate is over the whole call
+    generation = stats["total"] - stats["ttft"] if stats["streamed"] else stats["total"]
+    stats["tokens_per_sec"] = stats["tokens"] / generation if generation > 0 else 0.0
+    if cache is not None:
+        cache.put(model, messages, "".join(parts), stats["total"])
+    record("llm.stream_chat", start, prompt_tokens=stats["prompt_tokens"], cache_hit=False, ttft_s=stats["ttft"],
+           tokens=stats["tokens"], streamed=stats["streamed"])
+
+def format_stats(stats):
+    if "total" not in stats:
+        return ""
+    if stats.get("cached"):
+        return f"⚡ cached reply ({stats['cached']} match) · saved {stats['saved']:.1f}s"
+    mode = "" if stats.get("streamed") else " · blocking fallback"
+    return (f"⚡ first token {stats['ttft']:.2f}s · {stats['tokens_per_sec']:.0f} tok/s · {stats['total']:.1f}s total"
+            f" · {stats['prompt_tokens']:,} prompt tokens{mode}")
+
+class FakeClient:
+    """Offline stand-in for the Groq client that replies with canned text.
+
+    `latency` delays the first token, `token_delay` paces each streamed word and
+    `fail_stream` makes stream=True raise so the blocking fallback can be exercised."""
+
+    def __init__(self, reply="This is a canned reply from the fake LLM client.", latency=0.0, token_delay=0.0, fail_stream=False):
+        self.reply = reply
+        self.latency = latency
+        self.token_delay = token_delay
+        self.fail_stream = fail_stream
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, model, messages, stream=False, **kwargs):
+        self.calls.append({"model": model, "messages": messages, "stream": stream})
+        if stream and self.fail_stream:
+            raise RuntimeError("streaming disabled on fake client")
+        time.sleep(self.latency)
+        if not stream:
+            message = SimpleNamespace(content=self.reply)
+            return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+        return self._stream()
+
+    def _stream(self):
+        words = self.reply.split(" ")
+        for i, word in enumerate(words):
+            time.sleep(self.token_delay)
+            text = word if i == len(words) - 1 else word + " "
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
@@ -0,0 +1,203 @@
+import heapq
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+from types import SimpleNamespace
+from llm import INTERACTIVE
+from token_budget import message_tokens
+from tracing import span
+
+# One Groq client per process, shared by every app and thread. It keeps a pooled HTTP
+# connection, waits its turn in a token-bucket scheduler sized to the account's
+# requests/min and tokens/min limits, and retries 429s, 5xx responses, timeouts and
+# dropped connections with jittered exponential backoff (honouring Retry-After).
+# Waiting callers are served by priority, so interactive chat goes ahead of queued
+# background summaries. Point GROQ_BASE_URL at mock_groq_server.py to run offline. The
+# Groq SDK and its HTTP stack are only imported when the first request is sent.
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+class RateLimiter:
+    """Token buckets for requests and tokens per minute, served in priority order"""
+
+    def __init__(self, requests_per_minute, tokens_per_minute):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = float(requests_per_minute)
+        self._tokens = float(tokens_per_minute)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiting = []
+        self._order = itertools.count()
+        self._cond = threading.Condition()
+        self.waited = 0.0
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+        self._updated = now
+
+    def _wait_time(self, tokens, now):
+        waits = [self._blocked_until - now]
+        if self._requests < 1:
+            waits.append((1 - self._requests) * 60 / self.rpm)
+        if self._tokens < tokens:
+            waits.append((tokens - self._tokens) * 60 / self.tpm)
+        return max(waits)
+
+    def acquire(self, tokens, priority=INTERACTIVE):
+        """Block until this call may be sent; lower priority values go first. Returns the seconds waited"""
+        # A call larger than the whole bucket would otherwise never be admitted
+        tokens = min(tokens, self.tpm)
+        ticket = (priority, next(self._order))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            self._cond.notify_all()
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    wait = None
+                    if self._waiting[0] == ticket:
+                        wait = self._wait_time(tokens, now)
+                        if wait <= 0:
+                            self._requests -= 1
+                            self._tokens -= tokens
+                            break
+                    self._cond.wait(wait)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+            waited = time.monotonic() - started
+            self.waited += waited
+        return waited
+
+    def adjust(self, tokens):
+        """Charge (or refund, if negative) the difference between estimated and actual usage"""
+        with self._cond:
+            self._tokens -= tokens
+            self._cond.notify_all()
+
+    def pause(self, seconds):
+        """Hold every caller back, e.g. after a 429 with Retry-After"""
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+def _status(error):
+    return getattr(error, "status_code", None)
+
+def _retryable(error):
+    # A Groq SDK error can only have been raised once the SDK was imported
+    groq = sys.modules.get("groq")
+    if groq is not None and isinstance(error, groq.APIConnectionError):  # includes timeouts
+        return True
+    return _status(error) in RETRY_STATUSES
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+class LLMClient:
+    """Drop-in for the Groq client (client.chat.completions.create) with scheduling and retries.
+
+    `client` is the SDK client, or a function that makes it, called on the first request.
+    `create` also takes `priority`; see llm.INTERACTIVE and llm.BACKGROUND."""
+
+    def __init__(self, client, limiter, retries=4, timeout=60.0, backoff=1.0, max_backoff=30.0, completion_tokens=512):
+        self._client = client
+        self._client_lock = threading.Lock()
+        self.limiter = limiter
+        self.retries = retries
+        self.timeout = timeout
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.completion_tokens = completion_tokens
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0}
+        self._stats_lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _count(self, stat):
+        # Requests come from the script thread and several worker pools at once
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    @property
+    def client(self):
+        with self._client_lock:
+            if callable(self._client):
+                self._client = self._client()
+            return self._client
+
+    def _create(self, model, messages, stream=False, priority=INTERACTIVE, **kwargs):
+        estimate = message_tokens(messages) + kwargs.get("max_tokens", self.completion_tokens)
+        kwargs.setdefault("timeout", self.timeout)
+        # For streams the span ends once the response starts; llm.stream_chat times the rest
+        with span("llm.request", model=model, stream=stream, priority=priority, estimated_tokens=estimate) as s:
+            queued = 0.0
+            for attempt in range(self.retries + 1):
+                queued += self.limiter.acquire(estimate, priority)
+                self._count("calls")
+                s.set(attempts=attempt + 1, queued_s=queued)
+                try:
+                    response = self.client.chat.completions.create(model=model, messages=messages, stream=stream, **kwargs)
+                except Exception as e:
+                    s.set(last_error=_status(e) or type(e).__name__)
+                    if attempt == self.retries or not _retryable(e):
+                        raise
+                    delay = min(self.max_backoff, self.backoff * 2 ** attempt)
+                    delay = delay / 2 + random.uniform(0, delay / 2)
+                    retry_after = _retry_after(e)
+                    if _status(e) == 429:
+                        self._count("rate_limited")
+                        # The limit is per account, so every waiting caller backs off
+                        self.limiter.pause(retry_after or delay)
+                        delay = retry_after or delay
+                    self._count("retries")
+                    time.sleep(delay)
+                    continue
+                usage = getattr(response, "usage", None)
+                if not stream and usage is not None:
+                    self.limiter.adjust(usage.total_tokens - estimate)
+                    s.set(prompt_tokens=usage.prompt_tokens, completion_tokens=usage.completion_tokens)
+                return response
+
+def make_groq_client(api_key=None, base_url=None, max_connections=10, timeout=60.0):
+    """Groq SDK client on a pooled, keep-alive HTTP connection; retries are left to LLMClient"""
+    import groq
+    import httpx
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        timeout=timeout)
+    return groq.Groq(api_key=api_key or os.getenv("GROQ_API_KEY"), base_url=base_url or os.getenv("GROQ_BASE_URL"),
+                     http_client=http_client, max_retries=0)
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Process-wide client; limits come from GROQ_RPM, GROQ_TPM, GROQ_TIMEOUT and GROQ_RETRIES"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            timeout = float(os.getenv("GROQ_TIMEOUT", "60"))
+            limiter = RateLimiter(int(os.getenv("GROQ_RPM", "30")), int(os.getenv("GROQ_TPM", "12000")))
+            max_connections = int(os.getenv("GROQ_MAX_CONNECTIONS", "10"))
+            _client = LLMClient(lambda: make_groq_client(max_connections=max_connections, timeout=timeout),
+                                limiter, retries=int(os.getenv("GROQ_RETRIES", "4")), timeout=timeout)
+        return _client
+
+def format_client_stats(client):
+    stats = getattr(client, "stats", None)
+    if not stats:
+        return ""
+    return (f"LLM calls: {stats['calls']} · {stats['retries']} retries · {stats['rate_limited']} rate-limited"
+            f" · {client.limiter.waited:.0f}s queued")
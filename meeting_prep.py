@@ -1,18 +1,22 @@
 import streamlit as st
-from groq import Groq
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from sklearn.feature_extraction.text import TfidfVectorizer
-import faiss
-import numpy as np
-import tempfile
-import os
+import document_service
+import index_cache
+import ingest
+from llm import complete, stream_chat, format_stats
+from response_cache import get_cache, format_cache_stats
+from llm_client import get_client, format_client_stats
+from tracing import bind, start_trace, trace_rows
+from summarizer import summarize_document
+from token_budget import pack_chunks, trim_history
+from concurrent.futures import ThreadPoolExecutor
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+client = get_client()
+cache = get_cache()
 
 st.set_page_config(page_title="Meeting Prep AI", page_icon="🧠", layout="wide")
+start_trace("meeting_prep")
 
 with st.sidebar:
     st.title("🧠 Meeting Prep AI")
@@ -27,35 +31,25 @@ with st.sidebar:
 st.title("🧠 Meeting Prep AI")
 st.caption("No more walking into meetings unprepared. Upload your report, get briefed in 60 seconds.")
 
-@st.cache_resource
-def process_pdf(file_bytes):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(file_bytes)
-        tmp_path = tmp.name
-    loader = PyPDFLoader(tmp_path)
-    pages = loader.load()
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.split_documents(pages)
-    texts = [c.page_content for c in chunks]
-    vectorizer = TfidfVectorizer(max_features=384)
-    matrix = vectorizer.fit_transform(texts).toarray().astype('float32')
-    faiss.normalize_L2(matrix)
-    index = faiss.IndexFlatIP(matrix.shape[1])
-    index.add(matrix)
-    return texts, vectorizer, index
-
-def search(query, chunks, vectorizer, index, k=3):
-    vec = vectorizer.transform([query]).toarray().astype('float32')
-    faiss.normalize_L2(vec)
-    _, ids = index.search(vec, k=k)
-    return [chunks[i] for i in ids[0] if i < len(chunks)]
+def search(doc_id, query, k=8):
+    return [hit["text"] for hit in document_service.search(doc_id, query, k)]
+
+def read_report(doc_hash, chunks):
+    """Map-reduce the whole report into one summary, showing progress per level"""
+    with st.status("Reading the whole report...", expanded=False) as status:
+        bar = st.progress(0.0)
+        def progress(done, total, level):
+            bar.progress(done / total, text=f"Pass {level + 1}: {done}/{total} parts summarised")
+        report = summarize_document(client, doc_hash, chunks, progress=progress)
+        status.update(label="Report read", state="complete")
+    return report
 
 def ask_groq(messages):
-    response = client.chat.completions.create(
-        model="llama-3.3-70b-versatile",
-        messages=messages
-    )
-    return response.choices[0].message.content
+    """Stream the reply into the current container and return the full text"""
+    stats = {}
+    reply = st.write_stream(stream_chat(client, messages, stats=stats, cache=cache))
+    st.caption(format_stats(stats))
+    return reply
 
 if "messages" not in st.session_state:
     st.session_state.messages = []
@@ -63,56 +57,70 @@ if "brief_generated" not in st.session_state:
     st.session_state.brief_generated = False
 
 if uploaded_file:
+    file_bytes = uploaded_file.getvalue()
+    timings = {}
     with st.spinner("Reading report and building index..."):
-        chunks, vectorizer, index = process_pdf(uploaded_file.getvalue())
-    st.success(f"✅ {uploaded_file.name} ready — {len(chunks)} sections indexed")
-
-    # Auto-generate key questions on first upload
-    if not st.session_state.brief_generated:
-        with st.spinner("Generating your pre-meeting brief..."):
-            full_text = " ".join(chunks[:10])
-            questions = ask_groq([
+        # A report already ingested by any app is opened from the shared store
+        doc_hash = document_service.ingest_document(file_bytes, timings)
+        chunks = [c["text"] for c in document_service.get_chunks(doc_hash)]
+    stats = index_cache.cache_stats()
+    st.sidebar.caption(f"Index cache: {stats.get('hits', 0)} hits · {stats.get('misses', 0)} misses")
+    if timings:
+        st.sidebar.caption(f"Ingestion: {ingest.format_timings(timings)}")
+    if not chunks:
+        # A scanned PDF has no text layer; there is nothing to brief on or search
+        st.warning(f"⚠️ {uploaded_file.name} has no extractable text — it looks like a scanned PDF. "
+                   "Upload a version with selectable text.")
+    else:
+        st.success(f"✅ {uploaded_file.name} ready — {len(chunks)} sections indexed")
+
+        # Auto-generate key questions on first upload
+        if not st.session_state.brief_generated:
+            st.subheader("📋 Your Pre-Meeting Brief")
+            report = read_report(doc_hash, chunks)
+            questions_messages = [
                 {"role": "system", "content": "You are a business intelligence assistant helping a manager prepare for a meeting."},
-                {"role": "user", "content": f"Based on this business report, generate 5 sharp questions a manager should ask in the meeting:\n\n{full_text}"}
-            ])
-            summary = ask_groq([
-                {"role": "system", "content": "You are a business intelligence assistant."},
-                {"role": "user", "content": f"Summarise this business report in 3 bullet points a busy manager needs to know:\n\n{full_text}"}
-            ])
-
-        st.subheader("📋 Your Pre-Meeting Brief")
-        col1, col2 = st.columns(2)
-        with col1:
-            st.markdown("**Key Takeaways**")
-            st.markdown(summary)
-        with col2:
-            st.markdown("**Questions to Ask**")
-            st.markdown(questions)
-        st.divider()
-        st.session_state.brief_generated = True
-
-    st.subheader("💬 Ask anything about this report")
-    for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
-
-    if prompt := st.chat_input("Ask a follow-up question..."):
-        st.session_state.messages.append({"role": "user", "content": prompt})
-        with st.chat_message("user"):
-            st.markdown(prompt)
-
-        relevant = search(prompt, chunks, vectorizer, index)
-        context = "\n".join(relevant)
-        history = st.session_state.messages[-6:]
-        messages = [
-            {"role": "system", "content": f"You are a business intelligence assistant. Answer based on this report context:\n{context}"}
-        ] + history
-
-        with st.chat_message("assistant"):
-            reply = ask_groq(messages)
-            st.markdown(reply)
-
-        st.session_state.messages.append({"role": "assistant", "content": reply})
+                {"role": "user", "content": f"Based on this business report, generate 5 sharp questions a manager should ask in the meeting:\n\n{report}"}
+            ]
+            col1, col2 = st.columns(2)
+            # The questions are fetched in the background while the takeaways stream
+            with ThreadPoolExecutor(max_workers=1) as pool:
+                questions_future = pool.submit(bind(complete), client, questions_messages, cache=cache)
+                with col1:
+                    st.markdown("**Key Takeaways**")
+                    summary = ask_groq([
+                        {"role": "system", "content": "You are a business intelligence assistant."},
+                        {"role": "user", "content": f"Summarise this business report in 3 bullet points a busy manager needs to know:\n\n{report}"}
+                    ])
+                with col2:
+                    st.markdown("**Questions to Ask**")
+                    with st.spinner("Drafting questions..."):
+                        questions = questions_future.result()
+                    st.markdown(questions)
+            st.divider()
+            st.session_state.brief_generated = True
+
+        st.subheader("💬 Ask anything about this report")
+        for message in st.session_state.messages:
+            with st.chat_message(message["role"]):
+                st.markdown(message["content"])
+
+        if prompt := st.chat_input("Ask a follow-up question..."):
+            st.session_state.messages.append({"role": "user", "content": prompt})
+            with st.chat_message("user"):
+                st.markdown(prompt)
+
+            relevant, _ = pack_chunks(search(doc_hash, prompt))
+            context = "\n".join(relevant)
+            history = trim_history(st.session_state.messages)
+            messages = [
+                {"role": "system", "content": f"You are a business intelligence assistant. Answer based on this report context:\n{context}"}
+            ] + history
+
+            with st.chat_message("assistant"):
+                reply = ask_groq(messages)
+
+            st.session_state.messages.append({"role": "assistant", "content": reply})
 
 else:
     st.info("👈 Upload a business report in the sidebar to get your pre-meeting brief.")
@@ -124,3 +132,8 @@ else:
         st.markdown("**2. Get Briefed**\nGet key takeaways and smart questions automatically generated")
     with col3:
         st.markdown("**3. Ask**\nAsk follow-up questions in plain English before walking in")
+
+st.sidebar.caption(format_cache_stats(cache))
+st.sidebar.caption(format_client_stats(client))
+with st.sidebar.expander("⏱ Performance (this run)"):
+    st.dataframe(trace_rows(), hide_index=True, use_container_width=True)
@@ -0,0 +1,116 @@
+"""Local stand-in for the Groq chat completions API, for offline runs and load tests.
+
+Serves POST /openai/v1/chat/completions (blocking and SSE streaming) with a canned reply,
+and can be told to enforce a requests/min limit with 429 + Retry-After, add latency, or
+fail a share of calls with 503 so the shared client's queueing and retries can be seen.
+
+    python mock_groq_server.py --port 8765 --rpm 30 --fail-rate 0.1
+    GROQ_BASE_URL=http://127.0.0.1:8765 GROQ_API_KEY=mock streamlit run rag_chatbot.py
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "This is a reply from the mock Groq server. It has no knowledge, only latency."
+
+class MockGroqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    options = None
+    recent = deque()
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _over_limit(self):
+        """Sliding one-minute window; returns the seconds until a slot frees up, or 0"""
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if self.options.rpm and len(self.recent) >= self.options.rpm:
+                return 60 - (now - self.recent[0])
+            self.recent.append(now)
+        return 0
+
+    def do_POST(self):
+        if not self.path.endswith("/chat/completions"):
+            return self._json(404, {"error": {"message": "not found"}})
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        wait = self._over_limit()
+        if wait:
+            return self._json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_exceeded"}},
+                              {"retry-after": f"{wait:.2f}"})
+        if random.random() < self.options.fail_rate:
+            return self._json(503, {"error": {"message": "Service unavailable"}})
+        time.sleep(self.options.latency)
+
+        prompt_tokens = sum(len(m.get("content", "").split()) for m in request.get("messages", []))
+        words = self.options.reply.split(" ")
+        base = {"id": "chatcmpl-mock", "created": int(time.time()), "model": request.get("model", "mock")}
+        if not request.get("stream"):
+            return self._json(200, dict(base, object="chat.completion", choices=[
+                {"index": 0, "message": {"role": "assistant", "content": self.options.reply}, "finish_reason": "stop"}
+            ], usage={"prompt_tokens": prompt_tokens, "completion_tokens": len(words),
+                      "total_tokens": prompt_tokens + len(words)}))
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for i, word in enumerate(words):
+            time.sleep(self.options.token_delay)
+            delta = {"content": word if i == len(words) - 1 else word + " "}
+            self._chunk(dict(base, object="chat.completion.chunk", choices=[{"index": 0, "delta": delta, "finish_reason": None}]))
+        self._chunk(dict(base, object="chat.completion.chunk", choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        self._write(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, payload):
+        self._write(f"data: {json.dumps(payload)}\n\n".encode())
+
+    def _write(self, data):
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+def serve(port=8765, rpm=0, latency=0.0, token_delay=0.0, fail_rate=0.0, reply=REPLY):
+    """Start the server on a background thread and return it (call .shutdown() to stop)"""
+    MockGroqHandler.options = argparse.Namespace(rpm=rpm, latency=latency, token_delay=token_delay,
+                                                 fail_rate=fail_rate, reply=reply)
+    MockGroqHandler.recent.clear()
+    server = ThreadingHTTPServer(("127.0.0.1", port), MockGroqHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--rpm', type=int, default=0, help='requests per minute before answering 429 (0 = unlimited)')
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds before the first token')
+    parser.add_argument('--token-delay', type=float, default=0.02, help='seconds between streamed words')
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='share of calls answered with 503')
+    parser.add_argument('--reply', default=REPLY)
+    args = parser.parse_args()
+    server = serve(args.port, args.rpm, args.latency, args.token_delay, args.fail_rate, args.reply)
+    print(f"Mock Groq API on http://127.0.0.1:{args.port} — set GROQ_BASE_URL to use it")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -1,38 +1,74 @@
 import streamlit as st
-from groq import Groq
 from dotenv import load_dotenv
-from langchain_community.document_loaders import PyPDFLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-import os
-import tempfile
-import faiss
-import numpy as np
-from openai import OpenAI
+import document_service
+import ingest
+from knowledge_base import KnowledgeBase, dense_encoder, reranker
+from llm import stream_chat, format_stats
+from response_cache import get_cache, format_cache_stats
+from llm_client import get_client, format_client_stats
+from tracing import span, start_trace, trace_rows
+from token_budget import pack_chunks, trim_history
 
 load_dotenv()
-groq_client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY", "dummy"))
-
-def get_embeddings(texts):
-    """Use Groq-compatible embeddings via a simple TF-IDF approach"""
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    vectorizer = TfidfVectorizer(max_features=384)
-    matrix = vectorizer.fit_transform(texts)
-    return matrix.toarray(), vectorizer
-
-def search_chunks(query, chunks, vectorizer, index):
-    query_vec = vectorizer.transform([query]).toarray().astype('float32')
-    faiss.normalize_L2(query_vec)
-    _, indices = index.search(query_vec, k=3)
-    return [chunks[i] for i in indices[0] if i < len(chunks)]
+groq_client = get_client()
+cache = get_cache()
+
+@st.cache_resource
+def get_knowledge_base():
+    # One knowledge base per server process, persisted under KNOWLEDGE_BASE_DIR. The
+    # embedding model loads on the first upload or question (or now, if the store holds
+    # embeddings); it falls back to BM25 alone if the model cannot be loaded.
+    return KnowledgeBase.load(dense=dense_encoder, reranker=reranker())
+
+def search_chunks(query, kb, k=8):
+    return kb.search(query, k)
+
+def format_context(hits):
+    return "\n\n".join(f"[{h['source']}, p. {h['page']}]\n{h['text']}" for h in hits)
 
 st.set_page_config(page_title="Business Intel Assistant", page_icon="📊", layout="wide")
+start_trace("rag_chatbot")
+
+kb = get_knowledge_base()
+if "ingested" not in st.session_state:
+    st.session_state.ingested = set()
 
 with st.sidebar:
     st.title("📊 Business Intel Assistant")
-    st.caption("Upload a business report and ask questions in plain English.")
+    st.caption("Upload business reports and ask questions across all of them in plain English.")
     st.divider()
-    uploaded_file = st.file_uploader("Upload a PDF report", type=["pdf"])
+    uploaded_files = st.file_uploader("Upload PDF reports", type=["pdf"], accept_multiple_files=True)
+
+    # Only files new to this session are indexed, so a removed document is not re-added on rerun
+    for uploaded_file in uploaded_files or []:
+        if uploaded_file.file_id in st.session_state.ingested:
+            continue
+        file_bytes = uploaded_file.getvalue()
+        timings = {}
+        # Chunks stream from the parser (or the shared store) straight into the knowledge base
+        doc_id, chunks = document_service.document_chunks(file_bytes, timings)
+        if doc_id not in kb.documents:
+            with st.spinner(f"Indexing {uploaded_file.name}..."), span("kb.add_document", doc_id=doc_id[:12]):
+                added = kb.add_document(doc_id, uploaded_file.name, chunks, timings=timings)
+                kb.save()
+            if not added:
+                st.toast(f"⚠️ {uploaded_file.name} has no extractable text — it looks like a scanned PDF")
+            else:
+                detail = ingest.format_timings(timings) if "pages" in timings else "reused from the shared document store"
+                st.toast(f"✅ {uploaded_file.name} — {detail}")
+        st.session_state.ingested.add(uploaded_file.file_id)
+
+    st.divider()
+    st.markdown(f"**Knowledge base — {len(kb.documents)} documents**")
+    memory = kb.memory_report()
+    st.caption(f"Retrieval: {kb.retrieval_mode} · index {(memory['lexical'] + memory['dense']) / 1e6:.1f} MB")
+    for doc_id, doc in list(kb.documents.items()):
+        col1, col2 = st.columns([5, 1])
+        col1.caption(f"📄 {doc['name']} · {len(doc['chunk_ids'])} sections")
+        if col2.button("✕", key=f"remove_{doc_id}", help="Remove from knowledge base"):
+            kb.remove_document(doc_id)
+            kb.save()
+            st.rerun()
     st.divider()
     if st.button("🗑️ Clear conversation"):
         st.session_state.messages = []
@@ -46,56 +82,44 @@ with st.sidebar:
 st.title("Ask your business documents anything")
 st.caption("No more 2-hour meetings to understand a report. Just ask.")
 
-@st.cache_resource
-def process_pdf(file_bytes):
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
-        tmp.write(file_bytes)
-        tmp_path = tmp.name
-    loader = PyPDFLoader(tmp_path)
-    pages = loader.load()
-    splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=50)
-    chunks = splitter.split_documents(pages)
-    texts = [c.page_content for c in chunks]
-    matrix, vectorizer = get_embeddings(texts)
-    matrix = matrix.astype('float32')
-    faiss.normalize_L2(matrix)
-    index = faiss.IndexFlatIP(matrix.shape[1])
-    index.add(matrix)
-    return texts, vectorizer, index
-
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
-if uploaded_file:
-    with st.spinner("Building vector index..."):
-        chunks, vectorizer, index = process_pdf(uploaded_file.getvalue())
-    st.success(f"✅ Vector index ready — {len(chunks)} sections from {uploaded_file.name}")
+if kb.documents:
+    st.success(f"✅ Knowledge base ready — {len(kb.chunks)} sections from {len(kb.documents)} documents")
 
     for message in st.session_state.messages:
         with st.chat_message(message["role"]):
             st.markdown(message["content"])
 
-    if prompt := st.chat_input("Ask a question about your document..."):
+    if prompt := st.chat_input("Ask a question about your documents..."):
         st.session_state.messages.append({"role": "user", "content": prompt})
         with st.chat_message("user"):
             st.markdown(prompt)
 
-        relevant = search_chunks(prompt, chunks, vectorizer, index)
-        context = "\n".join(relevant)
+        # Retrieve generously, then keep the best chunks that fit the context budget
+        relevant, _ = pack_chunks(search_chunks(prompt, kb))
+        context = format_context(relevant)
 
-        history = st.session_state.messages[-6:]
+        history = trim_history(st.session_state.messages)
         messages = [
-            {"role": "system", "content": f"You are a business intelligence assistant. Answer clearly based on this document context:\n{context}"}
+            {"role": "system", "content": f"You are a business intelligence assistant. Answer clearly based on this document context, citing the source as [document, p. N] after each claim:\n{context}"}
         ] + history
 
         with st.chat_message("assistant"):
-            response = groq_client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=messages
-            )
-            reply = response.choices[0].message.content
-            st.markdown(reply)
+            stats = {}
+            reply = st.write_stream(stream_chat(groq_client, messages, stats=stats, cache=cache))
+            st.caption(format_stats(stats))
+            with st.expander("Sources"):
+                for hit in relevant:
+                    st.markdown(f"**{hit['source']}**, page {hit['page']}")
+                    st.caption(hit['text'])
 
         st.session_state.messages.append({"role": "assistant", "content": reply})
 else:
-    st.info("👈 Upload a PDF in the sidebar to get started.")
+    st.info("👈 Upload one or more PDFs in the sidebar to get started.")
+
+st.sidebar.caption(format_cache_stats(cache))
+st.sidebar.caption(format_client_stats(groq_client))
+with st.sidebar.expander("⏱ Performance (this run)"):
+    st.dataframe(trace_rows(), hide_index=True, use_container_width=True)
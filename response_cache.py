@@ -0,0 +1,156 @@
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+import numpy as np
+
+# Shared cache for Groq completions. Entries are keyed on the model plus a hash of the
+# whitespace-normalised messages and kept in a local SQLite file with a TTL and an LRU
+# size bound. With RESPONSE_CACHE_SEMANTIC set (a cosine threshold such as 0.92), a miss
+# also checks earlier questions asked against the same model and the same preceding
+# messages, and reuses the answer of one that is close enough.
+CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".response_cache.sqlite"))
+TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL", str(24 * 3600)))
+MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_MB", "64")) * 1024 * 1024
+SEMANTIC_THRESHOLD = float(os.getenv("RESPONSE_CACHE_SEMANTIC", "0") or 0) or None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    context_hash TEXT NOT NULL,
+    embedding BLOB,
+    response TEXT NOT NULL,
+    latency REAL NOT NULL,
+    created REAL NOT NULL,
+    last_used REAL NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_context ON responses(model, context_hash);
+CREATE INDEX IF NOT EXISTS idx_responses_last_used ON responses(last_used);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value REAL NOT NULL);
+"""
+
+def _normalise(messages):
+    return [{"role": m["role"], "content": re.sub(r"\s+", " ", m["content"]).strip()} for m in messages]
+
+def _hash(payload):
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+class ResponseCache:
+    def __init__(self, path=CACHE_PATH, ttl=TTL_SECONDS, max_bytes=MAX_BYTES, semantic_threshold=SEMANTIC_THRESHOLD):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.semantic_threshold = semantic_threshold
+        self._vectorizer = None
+        with self._connect() as db:
+            db.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        db = sqlite3.connect(self.path, timeout=10)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _embed(self, text):
+        if self._vectorizer is None:
+            from sklearn.feature_extraction.text import HashingVectorizer
+            self._vectorizer = HashingVectorizer(n_features=1024, alternate_sign=False, norm="l2")
+        return self._vectorizer.transform([text]).toarray()[0].astype('float32')
+
+    def _keys(self, model, messages):
+        messages = _normalise(messages)
+        # Semantic matches are only allowed between questions with identical preceding context
+        return _hash([model, messages]), _hash([model, messages[:-1]]), messages[-1]["content"]
+
+    def _count(self, db, name, amount=1):
+        db.execute("INSERT INTO counters VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    def get(self, model, messages):
+        """Return {"response", "latency", "match"} for a cached completion, or None"""
+        key, context_hash, question = self._keys(model, messages)
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT key, response, latency FROM responses WHERE key = ? AND created >= ?",
+                             (key, now - self.ttl)).fetchone()
+            match = "exact"
+            if row is None and self.semantic_threshold:
+                match = "semantic"
+                candidates = db.execute(
+                    "SELECT key, response, latency, embedding FROM responses "
+                    "WHERE model = ? AND context_hash = ? AND created >= ? AND embedding IS NOT NULL",
+                    (model, context_hash, now - self.ttl)).fetchall()
+                if candidates:
+                    query = self._embed(question)
+                    scores = [float(np.frombuffer(c[3], dtype='float32') @ query) for c in candidates]
+                    best = int(np.argmax(scores))
+                    if scores[best] >= self.semantic_threshold:
+                        row = candidates[best][:3]
+            if row is None:
+                self._count(db, "misses")
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (now, row[0]))
+            self._count(db, f"{match}_hits")
+            self._count(db, "saved_seconds", row[2])
+            return {"response": row[1], "latency": row[2], "match": match}
+
+    def put(self, model, messages, response, latency):
+        key, context_hash, question = self._keys(model, messages)
+        embedding = self._embed(question).tobytes() if self.semantic_threshold else None
+        now = time.time()
+        with self._connect() as db:
+            db.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+            db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       (key, model, context_hash, embedding, response, latency, now, now, len(response.encode())))
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                # Drop least recently used entries until the store fits again
+                rows = db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall()
+                for old_key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    db.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                    total -= size
+
+    def stats(self):
+        with self._connect() as db:
+            counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+            entries = db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        hits = counters.get("exact_hits", 0) + counters.get("semantic_hits", 0)
+        lookups = hits + counters.get("misses", 0)
+        return {
+            "entries": entries,
+            "hits": int(hits),
+            "semantic_hits": int(counters.get("semantic_hits", 0)),
+            "misses": int(counters.get("misses", 0)),
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "saved_seconds": counters.get("saved_seconds", 0.0),
+        }
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide cache instance, or None when RESPONSE_CACHE=0"""
+    global _cache
+    if os.getenv("RESPONSE_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
+
+def format_cache_stats(cache):
+    if cache is None:
+        return "Response cache off"
+    stats = cache.stats()
+    return f"Response cache: {stats['hit_rate']:.0%} hit rate · {stats['hits']} hits · {stats['saved_seconds']:.0f}s saved"
@@ -0,0 +1,176 @@
+import os
+import pickle
+import numpy as np
+
+# Retrieval engines shared by the document apps. Every engine is built from the list of
+# chunk texts and answers search(query, k) with [(chunk_id, score), ...] best first.
+#
+#   flat   - the original 384-feature dense TF-IDF + faiss.IndexFlatIP (kept as a baseline)
+#   tfidf  - full-vocabulary TF-IDF kept sparse, scored through the query terms' postings
+#   bm25   - Okapi BM25 over the same inverted postings
+#   hnsw   - TF-IDF reduced with TruncatedSVD into a faiss HNSW graph, for very large corpora
+#   ivf    - as hnsw, but with an IVF coarse quantizer (nlist ~ sqrt(chunks))
+#   sq8    - the SVD vectors stored as 8-bit scalar codes (4x smaller), searched exhaustively
+#   ivfpq  - IVF with product-quantized residuals (32x smaller), for the largest corpora
+#
+# scikit-learn and faiss are imported by the engines themselves, so importing this module
+# (every document app does at startup) costs nothing until a document is indexed or opened.
+BACKENDS = ("flat", "tfidf", "bm25", "hnsw", "ivf", "sq8", "ivfpq")
+
+def _top_k(ids, scores, k):
+    k = min(k, len(ids))
+    if k == 0:
+        return []
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return [(int(ids[i]), float(scores[i])) for i in top]
+
+def _score_postings(matrix, cols, weights, k):
+    """Score only the chunks that contain a query term, via the CSC columns of those terms"""
+    starts, ends = matrix.indptr[cols], matrix.indptr[cols + 1]
+    lengths = ends - starts
+    if lengths.sum() == 0:
+        return []
+    positions = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+    rows = matrix.indices[positions]
+    values = matrix.data[positions] * np.repeat(weights, lengths)
+    candidates, inverse = np.unique(rows, return_inverse=True)
+    return _top_k(candidates, np.bincount(inverse, weights=values), k)
+
+class FlatIndex:
+    """The original engine: capped dense TF-IDF searched by brute force"""
+
+    def __init__(self, texts, max_features=384):
+        import faiss
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        self.vectorizer = TfidfVectorizer(max_features=max_features)
+        matrix = self.vectorizer.fit_transform(texts).toarray().astype('float32')
+        faiss.normalize_L2(matrix)
+        self.index = faiss.IndexFlatIP(matrix.shape[1])
+        self.index.add(matrix)
+
+    def search(self, query, k=3):
+        import faiss
+        vec = self.vectorizer.transform([query]).toarray().astype('float32')
+        faiss.normalize_L2(vec)
+        scores, ids = self.index.search(vec, k)
+        return [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
+
+class TfidfIndex:
+    """Cosine similarity over a sparse, uncapped TF-IDF matrix"""
+
+    def __init__(self, texts):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        self.vectorizer = TfidfVectorizer(sublinear_tf=True, stop_words="english")
+        self.matrix = self.vectorizer.fit_transform(texts).tocsc()
+
+    def search(self, query, k=3):
+        vec = self.vectorizer.transform([query])
+        return _score_postings(self.matrix, vec.indices, vec.data, k)
+
+class BM25Index:
+    """Okapi BM25 with the per-posting term weights precomputed at build time"""
+
+    def __init__(self, texts, k1=1.5, b=0.75):
+        from sklearn.feature_extraction.text import CountVectorizer
+        self.vectorizer = CountVectorizer(stop_words="english")
+        counts = self.vectorizer.fit_transform(texts).tocsc().astype('float32')
+        doc_len = np.asarray(counts.sum(axis=1)).ravel()
+        avg_len = doc_len.mean() if len(doc_len) and doc_len.mean() > 0 else 1.0
+        doc_freq = np.diff(counts.indptr)
+        n = counts.shape[0]
+        idf = np.log1p((n - doc_freq + 0.5) / (doc_freq + 0.5)).astype('float32')
+        norm = (k1 * (1 - b + b * doc_len / avg_len)).astype('float32')
+        tf = counts.data
+        counts.data = tf * (k1 + 1) / (tf + norm[counts.indices]) * np.repeat(idf, doc_freq)
+        self.matrix = counts
+
+    def search(self, query, k=3):
+        vec = self.vectorizer.transform([query])
+        return _score_postings(self.matrix, vec.indices, np.ones(len(vec.indices), dtype='float32'), k)
+
+class AnnIndex:
+    """Approximate nearest neighbours over SVD-reduced TF-IDF vectors (faiss HNSW, IVF or quantized)"""
+
+    def __init__(self, texts, kind="hnsw", dim=256, hnsw_m=32, ef_search=64, nprobe=8, pq_bytes=None):
+        import faiss
+        from sklearn.decomposition import TruncatedSVD
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        self.vectorizer = TfidfVectorizer(sublinear_tf=True, stop_words="english")
+        matrix = self.vectorizer.fit_transform(texts)
+        dim = max(1, min(dim, matrix.shape[0] - 1, matrix.shape[1] - 1))
+        svd = TruncatedSVD(n_components=dim, random_state=0)
+        vectors = np.ascontiguousarray(svd.fit_transform(matrix), dtype='float32')
+        # Queries have a handful of terms, so projecting by gathering their rows is far
+        # cheaper than a sparse-dense product against the whole vocabulary
+        self.projection = np.ascontiguousarray(svd.components_.T, dtype='float32')
+        faiss.normalize_L2(vectors)
+        nlist = max(1, int(np.sqrt(len(vectors))))
+        if kind == "ivf":
+            self.index = faiss.IndexIVFFlat(faiss.IndexFlatIP(dim), dim, nlist, faiss.METRIC_INNER_PRODUCT)
+            self.index.train(vectors)
+            self.index.nprobe = min(nprobe, nlist)
+        elif kind == "sq8":
+            # Training records each dimension's value range for the 8-bit codes
+            self.index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+            self.index.train(vectors)
+        elif kind == "ivfpq":
+            # One byte per sub-vector of 8 dims by default; the sub-quantizer codebooks
+            # shrink for small documents, which have too few vectors to train 256 centroids
+            pq_bytes = pq_bytes or max(1, dim // 8)
+            while dim % pq_bytes:
+                pq_bytes -= 1
+            nbits = int(min(8, max(1, np.log2(len(vectors) / 4))))
+            self.index = faiss.IndexIVFPQ(faiss.IndexFlatIP(dim), dim, nlist, pq_bytes, nbits, faiss.METRIC_INNER_PRODUCT)
+            self.index.train(vectors)
+            self.index.nprobe = min(nprobe, nlist)
+        else:
+            self.index = faiss.IndexHNSWFlat(dim, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+            self.index.hnsw.efSearch = ef_search
+        self.index.add(vectors)
+
+    def search(self, query, k=3):
+        import faiss
+        terms = self.vectorizer.transform([query])
+        if terms.nnz == 0:
+            return []
+        vec = np.ascontiguousarray((terms.data @ self.projection[terms.indices])[None, :], dtype='float32')
+        faiss.normalize_L2(vec)
+        scores, ids = self.index.search(vec, k)
+        return [(int(i), float(s)) for i, s in zip(ids[0], scores[0]) if i >= 0]
+
+def build_index(texts, backend="bm25", **options):
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown retrieval backend '{backend}', expected one of {BACKENDS}")
+    if backend == "flat":
+        return FlatIndex(texts, **options)
+    if backend == "tfidf":
+        return TfidfIndex(texts)
+    if backend in ("hnsw", "ivf", "sq8", "ivfpq"):
+        # A single chunk cannot be projected or clustered; BM25 answers it exactly
+        if len(texts) < 2:
+            return BM25Index(texts)
+        return AnnIndex(texts, kind=backend, **options)
+    return BM25Index(texts, **options)
+
+def save_engine(engine, path):
+    """Pickle the engine, writing any FAISS index alongside with faiss.write_index"""
+    faiss_index = getattr(engine, "index", None)
+    if faiss_index is not None:
+        import faiss
+        faiss.write_index(faiss_index, os.path.join(path, "index.faiss"))
+        engine.index = None
+    try:
+        with open(os.path.join(path, "engine.pkl"), 'wb') as f:
+            pickle.dump(engine, f)
+    finally:
+        if faiss_index is not None:
+            engine.index = faiss_index
+
+def load_engine(path):
+    with open(os.path.join(path, "engine.pkl"), 'rb') as f:
+        engine = pickle.load(f)
+    if hasattr(engine, "index"):
+        import faiss
+        engine.index = faiss.read_index(os.path.join(path, "index.faiss"))
+    return engine
@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+# Pre-aggregated month x region x product cube for the sales dashboard. The raw frame is
+# scanned once per data load; every filter, KPI, chart and LLM context afterwards is an
+# index selection and a sum over an array whose size depends only on the number of
+# distinct months, regions and products, not on the number of rows.
+DIMENSIONS = ("month", "region", "product")
+MEASURES = ("revenue", "units_sold", "target")
+
+class SalesCube:
+    def __init__(self, axes, measures):
+        self.axes = axes
+        self.measures = measures
+
+    @classmethod
+    def from_frame(cls, df):
+        codes, axes = [], {}
+        for dim in DIMENSIONS:
+            # Months are shown chronologically; regions and products keep their order in the data
+            dim_codes, labels = pd.factorize(df[dim], sort=(dim == "month"))
+            codes.append(dim_codes)
+            axes[dim] = list(labels)
+        shape = tuple(len(axes[dim]) for dim in DIMENSIONS)
+        flat = np.ravel_multi_index(codes, shape)
+        measures = {}
+        for measure in MEASURES:
+            summed = np.bincount(flat, weights=df[measure].to_numpy(dtype='float64'), minlength=int(np.prod(shape)))
+            measures[measure] = summed.reshape(shape)
+        measures["units_sold"] = np.rint(measures["units_sold"]).astype('int64')
+        return cls(axes, measures)
+
+    def slice(self, months=None, regions=None, products=None):
+        """Sub-cube for the selected labels (None keeps the whole axis)"""
+        selected = {"month": months, "region": regions, "product": products}
+        positions, axes = [], {}
+        for dim in DIMENSIONS:
+            labels = self.axes[dim]
+            wanted = set(labels if selected[dim] is None else selected[dim])
+            keep = [i for i, label in enumerate(labels) if label in wanted]
+            positions.append(keep)
+            axes[dim] = [labels[i] for i in keep]
+        grid = np.ix_(*positions)
+        return SalesCube(axes, {m: values[grid] for m, values in self.measures.items()})
+
+    def total(self, measure):
+        return self.measures[measure].sum()
+
+    def frame(self, by, measures=MEASURES):
+        """Long-format DataFrame of the measures summed over every dimension not in `by`"""
+        keep = [DIMENSIONS.index(dim) for dim in by]
+        drop = tuple(i for i in range(len(DIMENSIONS)) if i not in keep)
+        # Summing leaves the kept axes in cube order; put them back in the order asked for
+        order = [sorted(keep).index(i) for i in keep]
+        index = pd.MultiIndex.from_product([self.axes[dim] for dim in by], names=list(by))
+        columns = {m: self.measures[m].sum(axis=drop).transpose(order).ravel() for m in measures}
+        return pd.DataFrame(columns, index=index).reset_index()
@@ -1,21 +1,69 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
-from groq import Groq
 from dotenv import load_dotenv
 import os
+from llm import stream_chat, format_stats
+from response_cache import get_cache, format_cache_stats
+from llm_client import get_client, format_client_stats
+from tracing import annotate, span, start_trace, trace_rows
+from sales_cube import SalesCube
+from data_backend import load_table, source_fingerprint
+from token_budget import format_table, trim_history
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+client = get_client()
+cache = get_cache()
 
 st.set_page_config(page_title="Sales Intelligence Dashboard", page_icon="📈", layout="wide")
+start_trace("sales_dashboard")
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data/sales_data.csv")
 
-@st.cache_data
 def load_data():
-    return pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data/sales_data.csv"))
+    with span("load_data"):
+        return load_table(DATA_FILE, categorical=['month', 'region', 'product'])
+
+@st.cache_resource
+def load_cube(version):
+    # Built once per data load; every rerun below only slices and sums it.
+    # `version` is the CSV fingerprint, so a new extract rebuilds the cube.
+    annotate(cache_hit=False)
+    df = load_data()
+    with span("build_cube", rows=len(df)):
+        return SalesCube.from_frame(df)
+
+# Chat and analysis contexts kept per filter selection, least recently used evicted first
+CONTEXT_CACHE_ENTRIES = int(os.getenv("DASHBOARD_CONTEXT_CACHE_ENTRIES", "64"))
+
+@st.cache_data(max_entries=CONTEXT_CACHE_ENTRIES)
+def build_context(version, months, regions, products):
+    """Token-packed summary tables for the LLM, computed once per data version and filter"""
+    annotate(cache_hit=False)
+    filtered = load_cube(version).slice(months=list(months), regions=list(regions), products=list(products))
+    revenue, target = filtered.total('revenue'), filtered.total('target')
+    summary = filtered.frame(['region']).rename(columns={'units_sold': 'units'})[['region', 'revenue', 'target', 'units']]
+    summary['attainment'] = (summary['revenue'] / summary['target'] * 100).round(1)
+    monthly = filtered.frame(['month'], ['revenue'])
+    if monthly.empty:
+        best_month = worst_month = "n/a"
+    else:
+        best_month = monthly.loc[monthly['revenue'].idxmax(), 'month']
+        worst_month = monthly.loc[monthly['revenue'].idxmin(), 'month']
+    by_region_product = filtered.frame(['region', 'product'], ['revenue']).sort_values('revenue', ascending=False)
+    analysis = f"""
+    Sales Data Summary:
+    - Total Revenue: €{revenue:,.0f}
+    - Target Attainment: {(revenue / target * 100) if target > 0 else 0:.1f}%
+    - Best Month: {best_month}
+    - Worst Month: {worst_month}
+    - Regional Performance:
+    {format_table(summary)}
+    """
+    return {"analysis": analysis, "chat": f"Sales data summary:\n{format_table(by_region_product)}"}
 
-df = load_data()
+version = source_fingerprint(DATA_FILE)
+with span("load_cube", cache_hit=True):
+    cube = load_cube(version)
 
 st.title("📈 Sales Intelligence Dashboard")
 st.caption("Real-time sales analytics with AI-powered insights")
@@ -23,20 +71,22 @@ st.caption("Real-time sales analytics with AI-powered insights")
 # Filters
 col1, col2, col3 = st.columns(3)
 with col1:
-    regions = st.multiselect("Region", df['region'].unique(), default=df['region'].unique())
+    regions = st.multiselect("Region", cube.axes['region'], default=cube.axes['region'])
 with col2:
-    products = st.multiselect("Product", df['product'].unique(), default=df['product'].unique())
+    products = st.multiselect("Product", cube.axes['product'], default=cube.axes['product'])
 with col3:
-    months = st.multiselect("Month", sorted(df['month'].unique()), default=sorted(df['month'].unique()))
+    months = st.multiselect("Month", cube.axes['month'], default=cube.axes['month'])
 
-filtered = df[df['region'].isin(regions) & df['product'].isin(products) & df['month'].isin(months)]
+with span("filter"):
+    filtered = cube.slice(months=months, regions=regions, products=products)
 
 # KPIs
 st.divider()
 k1, k2, k3, k4 = st.columns(4)
-total_revenue = filtered['revenue'].sum()
-total_units = filtered['units_sold'].sum()
-total_target = filtered['target'].sum()
+with span("kpis"):
+    total_revenue = filtered.total('revenue')
+    total_units = filtered.total('units_sold')
+    total_target = filtered.total('target')
 attainment = (total_revenue / total_target * 100) if total_target > 0 else 0
 
 k1.metric("Total Revenue", f"€{total_revenue:,.0f}")
@@ -49,24 +99,28 @@ st.divider()
 # Charts
 col1, col2 = st.columns(2)
 with col1:
-    rev_by_month = filtered.groupby('month')['revenue'].sum().reset_index()
+    with span("groupby", chart="revenue_by_month"):
+        rev_by_month = filtered.frame(['month'], ['revenue'])
     fig1 = px.line(rev_by_month, x='month', y='revenue', title='Revenue Over Time', markers=True)
     fig1.update_layout(xaxis_tickangle=45)
     st.plotly_chart(fig1, use_container_width=True)
 
 with col2:
-    rev_by_region = filtered.groupby('region')['revenue'].sum().reset_index()
+    with span("groupby", chart="revenue_by_region"):
+        rev_by_region = filtered.frame(['region'], ['revenue'])
     fig2 = px.bar(rev_by_region, x='region', y='revenue', title='Revenue by Region', color='region')
     st.plotly_chart(fig2, use_container_width=True)
 
 col3, col4 = st.columns(2)
 with col3:
-    rev_by_product = filtered.groupby('product')['revenue'].sum().reset_index()
+    with span("groupby", chart="revenue_by_product"):
+        rev_by_product = filtered.frame(['product'], ['revenue'])
     fig3 = px.pie(rev_by_product, values='revenue', names='product', title='Revenue by Product')
     st.plotly_chart(fig3, use_container_width=True)
 
 with col4:
-    region_month = filtered.groupby(['month', 'region'])['revenue'].sum().reset_index()
+    with span("groupby", chart="region_month"):
+        region_month = filtered.frame(['month', 'region'], ['revenue'])
     fig4 = px.line(region_month, x='month', y='revenue', color='region', title='Regional Performance Over Time', markers=True)
     fig4.update_layout(xaxis_tickangle=45)
     st.plotly_chart(fig4, use_container_width=True)
@@ -79,37 +133,19 @@ col1, col2 = st.columns([1, 3])
 with col1:
     analyze_btn = st.button("🔍 Analyse this data", type="primary")
 
-if analyze_btn:
-    summary = filtered.groupby('region').agg(
-        revenue=('revenue', 'sum'),
-        target=('target', 'sum'),
-        units=('units_sold', 'sum')
-    ).reset_index()
-    summary['attainment'] = (summary['revenue'] / summary['target'] * 100).round(1)
+# Sorted so the same selection in any order shares one cache entry
+selection = (version, tuple(sorted(months)), tuple(sorted(regions)), tuple(sorted(products)))
 
-    monthly = filtered.groupby('month')['revenue'].sum().reset_index()
-    best_month = monthly.loc[monthly['revenue'].idxmax(), 'month']
-    worst_month = monthly.loc[monthly['revenue'].idxmin(), 'month']
-
-    data_summary = f"""
-    Sales Data Summary:
-    - Total Revenue: €{total_revenue:,.0f}
-    - Target Attainment: {attainment:.1f}%
-    - Best Month: {best_month}
-    - Worst Month: {worst_month}
-    - Regional Performance:
-    {summary.to_string()}
-    """
+if analyze_btn:
+    with span("build_context", cache_hit=True):
+        data_summary = build_context(*selection)["analysis"]
 
-    with st.spinner("Analysing your data..."):
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a senior business analyst. Provide sharp, actionable insights from sales data. Be specific, identify patterns, flag risks, suggest actions. Use bullet points."},
-                {"role": "user", "content": f"Analyse this sales data and give me the 5 most important insights a sales director needs to know:\n{data_summary}"}
-            ]
-        )
-    st.markdown(response.choices[0].message.content)
+    stats = {}
+    st.write_stream(stream_chat(client, [
+        {"role": "system", "content": "You are a senior business analyst. Provide sharp, actionable insights from sales data. Be specific, identify patterns, flag risks, suggest actions. Use bullet points."},
+        {"role": "user", "content": f"Analyse this sales data and give me the 5 most important insights a sales director needs to know:\n{data_summary}"}
+    ], stats=stats, cache=cache))
+    st.caption(format_stats(stats))
 
 st.divider()
 if "dash_messages" not in st.session_state:
@@ -125,17 +161,20 @@ if prompt := st.chat_input("e.g. Why is South underperforming? Which product sho
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    data_context = f"Sales data summary:\n{filtered.groupby(['region','product'])['revenue'].sum().reset_index().to_string()}"
-    history = st.session_state.dash_messages[-6:]
+    with span("build_context", cache_hit=True):
+        data_context = build_context(*selection)["chat"]
+    history = trim_history(st.session_state.dash_messages)
     messages = [
         {"role": "system", "content": f"You are a senior business analyst. Answer questions about this sales data with specific numbers and actionable recommendations:\n{data_context}"}
     ] + history
 
     with st.chat_message("assistant"):
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=messages
-        )
-        reply = response.choices[0].message.content
-        st.markdown(reply)
+        stats = {}
+        reply = st.write_stream(stream_chat(client, messages, stats=stats, cache=cache))
+        st.caption(format_stats(stats))
     st.session_state.dash_messages.append({"role": "assistant", "content": reply})
+
+st.sidebar.caption(format_cache_stats(cache))
+st.sidebar.caption(format_client_stats(client))
+with st.sidebar.expander("⏱ Performance (this run)"):
+    st.dataframe(trace_rows(), hide_index=True, use_container_width=True)
@@ -0,0 +1,94 @@
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import index_cache
+from llm import BACKGROUND, complete
+from token_budget import count_tokens, remove_overlap, truncate
+from tracing import bind, span
+
+# Hierarchical map-reduce summaries for whole documents. Consecutive chunks are grouped
+# into batches of about SUMMARY_BATCH_TOKENS, each batch is summarised in parallel (at
+# most SUMMARY_WORKERS calls at a time), and the summaries are grouped and summarised
+# again until they fit in a single batch. Latency grows with the depth of that tree, not
+# with the page count. Every intermediate summary is stored per document hash in the
+# index cache, so re-opening a report, or resuming after a failed call, only pays for
+# the missing pieces. The calls are queued behind interactive chat by the shared client.
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "4"))
+BATCH_TOKENS = int(os.getenv("SUMMARY_BATCH_TOKENS", "3000"))
+MAX_DEPTH = 6
+
+SYSTEM = "You are a business intelligence assistant."
+MAP_PROMPT = ("Summarise this part of a business report in at most 8 bullet points. "
+              "Keep every figure, date, name, risk and decision:\n\n{text}")
+REDUCE_PROMPT = ("Combine these summaries of consecutive parts of a business report into one summary "
+                 "of at most 12 bullet points. Keep the most important figures, risks and decisions:\n\n{text}")
+
+def batch_texts(texts, budget=BATCH_TOKENS):
+    """Group consecutive texts into batches of at most `budget` tokens, dropping splitter overlap"""
+    batches, current, used, previous = [], [], 0, ""
+    for text in texts:
+        text = remove_overlap(previous, text)
+        previous = text or previous
+        if not text:
+            continue
+        tokens = count_tokens(text)
+        if current and used + tokens > budget:
+            batches.append("\n".join(current))
+            current, used = [], 0
+        current.append(truncate(text, budget))
+        used += min(tokens, budget)
+    if current:
+        batches.append("\n".join(current))
+    return batches
+
+def _key(template, text):
+    return hashlib.sha256((template + text).encode()).hexdigest()
+
+def _summarize_level(client, doc_hash, batches, template, stored, workers, progress, level):
+    results = {}
+    pending = {}
+    for i, batch in enumerate(batches):
+        key = _key(template, batch)
+        if key in stored:
+            results[i] = stored[key]
+        else:
+            pending[i] = key
+    if progress:
+        progress(len(results), len(batches), level)
+    if pending:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(bind(complete), client, [
+                {"role": "system", "content": SYSTEM},
+                {"role": "user", "content": template.format(text=batches[i])}
+            ], priority=BACKGROUND): i for i in pending}
+            error = None
+            # Every call is waited for, so summaries still in flight when one fails are kept too
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = stored[pending[i]] = future.result()
+                except Exception as e:
+                    error = error or e
+                    continue
+                if progress:
+                    progress(len(results), len(batches), level)
+        index_cache.save_summaries(doc_hash, stored)
+        if error:
+            raise error
+    return [results[i] for i in range(len(batches))]
+
+def summarize_document(client, doc_hash, chunks, workers=SUMMARY_WORKERS, batch_tokens=BATCH_TOKENS, progress=None):
+    """Reduce a document's chunks to a single text of at most `batch_tokens` tokens.
+
+    A document that already fits is returned as is. `progress(done, total, level)` is
+    called from the calling thread as summaries complete."""
+    stored = index_cache.load_summaries(doc_hash)
+    texts, template = chunks, MAP_PROMPT
+    for level in range(MAX_DEPTH):
+        batches = batch_texts(texts, batch_tokens)
+        if len(batches) <= 1:
+            return batches[0] if batches else ""
+        with span("summarize_level", level=level, batches=len(batches)):
+            texts = _summarize_level(client, doc_hash, batches, template, stored, workers, progress, level)
+        template = REDUCE_PROMPT
+    return truncate("\n".join(texts), batch_tokens)
@@ -0,0 +1,144 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+# Deterministic supplier risk analytics for the supply chain dashboard. The raw rows are
+# grouped once into a supplier x category x month x metric array; everything else is
+# NumPy over that array:
+#   - anomalies: each month against the mean and spread of the WINDOW months before it,
+#     per supplier and category, flagged when the z-score is Z_THRESHOLD or worse. The
+#     spread is floored at the metric's typical month-to-month noise, so a few quiet
+#     months do not turn ordinary variation into alerts
+#   - trends: least-squares slope per supplier over the last TREND_MONTHS months
+#   - stockout forecast: exponentially weighted monthly stockout rate (next-month odds)
+#   - risk score: levels over the selected months and recent trends, standardised
+#     against the whole panel, weighted and squashed into 0-100
+# The LLM gets the ranked findings table instead of raw averages.
+METRICS = ("delivery_rate", "lead_time_days", "stockout_incident", "quality_score")
+# +1 where a higher value means more risk, -1 where it means less
+DIRECTION = np.array([-1.0, 1.0, 1.0, -1.0])
+WEIGHTS = np.array([0.35, 0.2, 0.3, 0.15])
+# Stockouts are 0/1 per row, so a z-score against a quiet baseline is meaningless;
+# they feed the forecast and the score instead
+ANOMALY_METRICS = ("delivery_rate", "lead_time_days", "quality_score")
+WINDOW = 6
+MIN_BASELINE = 3
+Z_THRESHOLD = 2.5
+TREND_MONTHS = 6
+STOCKOUT_DECAY = 0.5
+
+def _panel(df):
+    """supplier x category x month x metric array of means (NaN where there were no rows)"""
+    grouped = df.groupby(['supplier', 'category', 'month'], observed=True)[list(METRICS)].mean()
+    suppliers = sorted(grouped.index.unique('supplier'))
+    categories = sorted(grouped.index.unique('category'))
+    months = sorted(grouped.index.unique('month'))
+    full = pd.MultiIndex.from_product([suppliers, categories, months], names=['supplier', 'category', 'month'])
+    values = grouped.reindex(full).to_numpy(dtype='float64')
+    return values.reshape(len(suppliers), len(categories), len(months), len(METRICS)), suppliers, categories, months
+
+def _rolling_baseline(values):
+    """Mean and std of the WINDOW previous months for every point, over the month axis"""
+    m = values.shape[2]
+    present = ~np.isnan(values)
+    filled = np.where(present, values, 0.0)
+    months = np.arange(m)
+    start = np.maximum(months - WINDOW, 0)
+
+    def window_sums(a):
+        # Cumulative sums with a leading zero, so sums[t] - sums[t - WINDOW] covers the months before t
+        sums = np.concatenate([np.zeros_like(a[:, :, :1]), np.cumsum(a, axis=2)], axis=2)
+        return sums[:, :, months] - sums[:, :, start]
+
+    n = window_sums(present.astype('float64'))
+    total = window_sums(filled)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / n
+        var = (window_sums(filled ** 2) - total * mean) / (n - 1)
+    enough = n >= MIN_BASELINE
+    mean = np.where(enough, mean, np.nan)
+    std = np.where(enough, np.sqrt(np.maximum(var, 0)), np.nan)
+    return mean, std
+
+def _slopes(series):
+    """Least-squares slope per month along the last axis, ignoring NaNs"""
+    t = np.arange(series.shape[-1], dtype='float64')
+    mask = ~np.isnan(series)
+    n = mask.sum(axis=-1)
+    t_mean = np.where(n > 0, (t * mask).sum(axis=-1) / np.maximum(n, 1), 0)
+    y_mean = np.nanmean(np.where(mask, series, np.nan), axis=-1)
+    dt = np.where(mask, t - t_mean[..., None], 0)
+    dy = np.where(mask, series - y_mean[..., None], 0)
+    denom = (dt ** 2).sum(axis=-1)
+    return np.where(denom > 0, (dt * dy).sum(axis=-1) / np.where(denom > 0, denom, 1), 0.0)
+
+def analyse(df, top_anomalies=10):
+    """Return (findings, anomalies): one ranked row per supplier, and the worst anomalies"""
+    if df.empty:
+        return pd.DataFrame(), pd.DataFrame()
+    values, suppliers, categories, months = _panel(df)
+
+    # Rolling z-score anomalies, signed so that positive means worse
+    mean, std = _rolling_baseline(values)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        noise = np.nanmean(np.nanstd(values, axis=2), axis=(0, 1))
+    spread = np.fmax(std, noise)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        z = (values - mean) / np.where(spread > 0, spread, np.nan) * DIRECTION
+    checked = [METRICS.index(metric) for metric in ANOMALY_METRICS]
+    flagged = np.zeros(z.shape, dtype=bool)
+    flagged[..., checked] = np.nan_to_num(z[..., checked], nan=0.0) >= Z_THRESHOLD
+    s_idx, c_idx, m_idx, k_idx = np.nonzero(flagged)
+    anomalies = pd.DataFrame({
+        'supplier': np.array(suppliers, dtype=object)[s_idx],
+        'category': np.array(categories, dtype=object)[c_idx],
+        'month': np.array(months, dtype=object)[m_idx],
+        'metric': np.array(METRICS, dtype=object)[k_idx],
+        'value': values[s_idx, c_idx, m_idx, k_idx].round(1),
+        'baseline': mean[s_idx, c_idx, m_idx, k_idx].round(1),
+        'z': (z[s_idx, c_idx, m_idx, k_idx] * DIRECTION[k_idx]).round(1),
+        'severity': z[s_idx, c_idx, m_idx, k_idx],
+    }).sort_values('severity', ascending=False)
+
+    # Supplier-level monthly series, averaged over categories
+    with warnings.catch_warnings():
+        # All-NaN slices (a supplier with no rows in a month) are expected here
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        supplier_series = np.nanmean(values, axis=1)  # supplier x month x metric
+        period = np.nanmean(supplier_series, axis=1)
+        panel_mean = np.nanmean(supplier_series, axis=(0, 1))
+        panel_std = np.nanstd(supplier_series, axis=(0, 1))
+    slopes = _slopes(supplier_series[:, -TREND_MONTHS:].transpose(0, 2, 1))  # supplier x metric
+
+    # Next-month stockout odds: recent months weigh more
+    stockouts = supplier_series[:, :, METRICS.index("stockout_incident")]
+    weights = STOCKOUT_DECAY ** np.arange(len(months))[::-1]
+    observed = ~np.isnan(stockouts)
+    forecast = (np.nan_to_num(stockouts) * weights).sum(axis=1) / np.maximum((observed * weights).sum(axis=1), 1e-9)
+
+    levels = period.copy()
+    levels[:, METRICS.index("stockout_incident")] = forecast
+    scale = np.where(panel_std > 0, panel_std, 1.0)
+    level_z = (levels - panel_mean) / scale * DIRECTION
+    trend_z = slopes * min(TREND_MONTHS, len(months)) / scale * DIRECTION
+    raw = (np.nan_to_num(level_z + 0.5 * trend_z) * WEIGHTS).sum(axis=1)
+    risk = 100 / (1 + np.exp(-raw))
+
+    counts = anomalies.groupby('supplier').size().reindex(suppliers, fill_value=0)
+    worst = anomalies.drop_duplicates('supplier').set_index('supplier')
+    # Every column goes through astype(str), so the concatenation has one string dtype even when empty
+    worst = (worst['month'].astype(str) + ' ' + worst['category'].astype(str) + ' ' + worst['metric'].astype(str) + ' '
+             + worst['value'].astype(str) + ' vs ' + worst['baseline'].astype(str) + ' (z ' + worst['z'].astype(str) + ')')
+    findings = pd.DataFrame({
+        'supplier': suppliers,
+        'risk_score': risk.round(0).astype(int),
+        'delivery_rate': period[:, 0].round(1),
+        'delivery_trend': slopes[:, 0].round(2),
+        'lead_time_days': period[:, 1].round(1),
+        'quality_score': period[:, 3].round(1),
+        'stockout_next_month': (forecast * 100).round(0),
+        'anomalies': counts.to_numpy(dtype='int64'),
+        'worst_anomaly': worst.reindex(suppliers).fillna('').to_numpy(dtype=object),
+    }).sort_values('risk_score', ascending=False).reset_index(drop=True)
+    return findings, anomalies.drop(columns='severity').head(top_anomalies).reset_index(drop=True)
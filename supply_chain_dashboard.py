@@ -1,39 +1,74 @@
 import streamlit as st
-import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
-from groq import Groq
 from dotenv import load_dotenv
 import os
+from llm import stream_chat, format_stats
+from response_cache import get_cache, format_cache_stats
+from llm_client import get_client, format_client_stats
+from tracing import annotate, span, start_trace, trace_rows
+from data_backend import load_table, source_fingerprint
+from token_budget import format_table, trim_history
+import supplier_risk
 
 load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+client = get_client()
+cache = get_cache()
 
 st.set_page_config(page_title="Supply Chain Analytics", page_icon="🚚", layout="wide")
-
-@st.cache_data
-def load_data():
-    return pd.read_csv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "data/supply_chain_data.csv"))
-
-df = load_data()
+start_trace("supply_chain_dashboard")
+
+DATA_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data/supply_chain_data.csv")
+COLUMNS = ['month', 'supplier', 'category', 'delivery_rate', 'lead_time_days', 'order_value', 'stockout_incident', 'quality_score']
+
+@st.cache_resource
+def load_data(version):
+    # cache_resource shares one read-only frame instead of copying it on every rerun;
+    # `version` is the CSV fingerprint, so a new extract invalidates the cache
+    annotate(cache_hit=False)
+    return load_table(DATA_FILE, columns=COLUMNS, categorical=['month', 'supplier', 'category'])
+
+# Chat and analysis contexts kept per filter selection, least recently used evicted first
+CONTEXT_CACHE_ENTRIES = int(os.getenv("DASHBOARD_CONTEXT_CACHE_ENTRIES", "64"))
+
+@st.cache_data(max_entries=CONTEXT_CACHE_ENTRIES)
+def build_context(version, suppliers, categories):
+    """Token-packed summary tables for the LLM, computed once per data version and filter"""
+    annotate(cache_hit=False)
+    df = load_data(version)
+    filtered = df[df['supplier'].isin(suppliers) & df['category'].isin(categories)]
+    findings, anomalies = supplier_risk.analyse(filtered)
+    analysis = f"""Supplier risk ranking (risk_score 0-100; delivery_trend in points per month; stockout_next_month in %):
+{format_table(findings)}
+
+Largest anomalies against each series' previous {supplier_risk.WINDOW} months:
+{format_table(anomalies)}"""
+    chat = f"Supplier risk ranking:\n{format_table(findings)}"
+    return {"analysis": analysis, "chat": chat, "findings": findings}
+
+version = source_fingerprint(DATA_FILE)
+with span("load_data", cache_hit=True):
+    df = load_data(version)
 
 st.title("🚚 Supply Chain Performance Analytics")
 st.caption("Supplier performance, delivery reliability and stockout risk analysis")
 
 col1, col2 = st.columns(2)
 with col1:
-    suppliers = st.multiselect("Supplier", df['supplier'].unique(), default=list(df['supplier'].unique()))
+    suppliers = st.multiselect("Supplier", list(df['supplier'].unique()), default=list(df['supplier'].unique()))
 with col2:
-    categories = st.multiselect("Category", df['category'].unique(), default=list(df['category'].unique()))
+    categories = st.multiselect("Category", list(df['category'].unique()), default=list(df['category'].unique()))
 
-filtered = df[df['supplier'].isin(suppliers) & df['category'].isin(categories)]
+with span("filter") as s:
+    filtered = df[df['supplier'].isin(suppliers) & df['category'].isin(categories)]
+    s.set(rows=len(filtered))
 
 st.divider()
 k1, k2, k3, k4 = st.columns(4)
-avg_delivery = filtered['delivery_rate'].mean()
-avg_lead = filtered['lead_time_days'].mean()
-total_stockouts = filtered['stockout_incident'].sum()
-total_value = filtered['order_value'].sum()
+with span("kpis"):
+    avg_delivery = filtered['delivery_rate'].mean()
+    avg_lead = filtered['lead_time_days'].mean()
+    total_stockouts = filtered['stockout_incident'].sum()
+    total_value = filtered['order_value'].sum()
 
 k1.metric("Avg Delivery Rate", f"{avg_delivery:.1f}%", delta=f"{avg_delivery-92:.1f}% vs target")
 k2.metric("Avg Lead Time", f"{avg_lead:.1f} days")
@@ -44,11 +79,12 @@ st.divider()
 
 col1, col2 = st.columns(2)
 with col1:
-    sup_perf = filtered.groupby('supplier').agg(
-        delivery_rate=('delivery_rate', 'mean'),
-        quality_score=('quality_score', 'mean'),
-        stockouts=('stockout_incident', 'sum')
-    ).reset_index().round(1)
+    with span("groupby", chart="supplier_performance"):
+        sup_perf = filtered.groupby('supplier', observed=True).agg(
+            delivery_rate=('delivery_rate', 'mean'),
+            quality_score=('quality_score', 'mean'),
+            stockouts=('stockout_incident', 'sum')
+        ).reset_index().round(1)
     fig1 = px.bar(sup_perf, x='supplier', y='delivery_rate',
                   title='Delivery Rate by Supplier',
                   color='delivery_rate',
@@ -58,7 +94,8 @@ with col1:
     st.plotly_chart(fig1, use_container_width=True)
 
 with col2:
-    monthly = filtered.groupby(['month', 'supplier'])['delivery_rate'].mean().reset_index()
+    with span("groupby", chart="monthly_delivery"):
+        monthly = filtered.groupby(['month', 'supplier'], observed=True)['delivery_rate'].mean().reset_index()
     fig2 = px.line(monthly, x='month', y='delivery_rate', color='supplier',
                    title='Delivery Rate Trend by Supplier', markers=True)
     fig2.add_hline(y=90, line_dash="dash", line_color="red", annotation_text="Target")
@@ -67,7 +104,8 @@ with col2:
 
 col3, col4 = st.columns(2)
 with col3:
-    lead_time = filtered.groupby('supplier')['lead_time_days'].mean().reset_index()
+    with span("groupby", chart="lead_time"):
+        lead_time = filtered.groupby('supplier', observed=True)['lead_time_days'].mean().reset_index()
     fig3 = px.bar(lead_time, x='supplier', y='lead_time_days',
                   title='Average Lead Time by Supplier (days)',
                   color='lead_time_days',
@@ -75,7 +113,8 @@ with col3:
     st.plotly_chart(fig3, use_container_width=True)
 
 with col4:
-    stockouts = filtered.groupby('supplier')['stockout_incident'].sum().reset_index()
+    with span("groupby", chart="stockouts"):
+        stockouts = filtered.groupby('supplier', observed=True)['stockout_incident'].sum().reset_index()
     fig4 = px.bar(stockouts, x='supplier', y='stockout_incident',
                   title='Stockout Incidents by Supplier',
                   color='stockout_incident',
@@ -84,33 +123,22 @@ with col4:
 
 st.divider()
 st.subheader("🤖 AI Supply Chain Analyst")
+# Sorted so the same selection in any order shares one cache entry
+selection = (version, tuple(sorted(suppliers)), tuple(sorted(categories)))
+st.markdown("**Supplier risk ranking**")
+with span("build_context", cache_hit=True):
+    findings = build_context(*selection)["findings"]
+st.dataframe(findings, use_container_width=True, hide_index=True)
+
 if st.button("🔍 Analyse Supplier Performance", type="primary"):
-    sup_summary = filtered.groupby('supplier').agg(
-        avg_delivery=('delivery_rate', 'mean'),
-        avg_lead_time=('lead_time_days', 'mean'),
-        total_stockouts=('stockout_incident', 'sum'),
-        avg_quality=('quality_score', 'mean'),
-        total_value=('order_value', 'sum')
-    ).reset_index().round(2)
-
-    monthly_issues = filtered[filtered['delivery_rate'] < 75].groupby(
-        ['supplier', 'month'])['delivery_rate'].mean().reset_index()
-
-    with st.spinner("Analysing supply chain data..."):
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": "You are a senior supply chain analyst. Provide sharp, specific insights with clear recommendations. Use bullet points."},
-                {"role": "user", "content": f"""Analyse this supplier performance data and give me the 5 most critical insights:
-
-Supplier Summary:
-{sup_summary.to_string()}
-
-Critical Incidents (delivery rate below 75%):
-{monthly_issues.to_string()}"""}
-            ]
-        ).choices[0].message.content
-    st.markdown(response)
+    stats = {}
+    st.write_stream(stream_chat(client, [
+        {"role": "system", "content": "You are a senior supply chain analyst. Provide sharp, specific insights with clear recommendations. Use bullet points."},
+        {"role": "user", "content": f"""Explain these supplier risk findings and give me the 5 most critical insights with recommended actions:
+
+{build_context(*selection)["analysis"]}"""}
+    ], stats=stats, cache=cache))
+    st.caption(format_stats(stats))
 
 st.divider()
 st.subheader("💬 Ask the supply chain data")
@@ -126,16 +154,19 @@ if prompt := st.chat_input("e.g. Which supplier is highest risk?"):
     with st.chat_message("user"):
         st.markdown(prompt)
 
-    data_context = f"Supply chain data:\n{filtered.groupby('supplier').agg({'delivery_rate': 'mean', 'lead_time_days': 'mean', 'stockout_incident': 'sum', 'order_value': 'sum'}).round(2).to_string()}"
+    data_context = build_context(*selection)["chat"]
+    history = trim_history(st.session_state.sc_messages)
 
     with st.chat_message("assistant"):
-        response = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
-                {"role": "system", "content": f"You are a senior supply chain analyst:\n{data_context}"},
-                {"role": "user", "content": prompt}
-            ]
-        ).choices[0].message.content
-        st.markdown(response)
+        stats = {}
+        response = st.write_stream(stream_chat(client, [
+            {"role": "system", "content": f"You are a senior supply chain analyst:\n{data_context}"}
+        ] + history, stats=stats, cache=cache))
+        st.caption(format_stats(stats))
 
     st.session_state.sc_messages.append({"role": "assistant", "content": response})
+
+st.sidebar.caption(format_cache_stats(cache))
+st.sidebar.caption(format_client_stats(client))
+with st.sidebar.expander("⏱ Performance (this run)"):
+    st.dataframe(trace_rows(), hide_index=True, use_container_width=True)
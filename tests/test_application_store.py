@@ -0,0 +1,29 @@
+import pytest
+import application_store
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(application_store, "DB_FILE", str(tmp_path / "applications.sqlite"))
+    monkeypatch.setattr(application_store, "LEGACY_JSON", str(tmp_path / "applications.json"))
+    application_store.init_store()
+
+def app(company, status="Applied", date="2026-10-01"):
+    return {"date": date, "company": company, "title": "Analyst", "status": status}
+
+def test_counters_follow_saves_and_updates():
+    ids = application_store.save_applications([app("Acme"), app("beta"), app("Acme", "Interview")])
+    application_store.update_application(ids[1], {"company": "Gamma", "status": "Rejected"})
+    assert application_store.companies() == ["Acme", "Gamma"]
+    assert application_store.count_applications() == 3
+    assert application_store.count_applications(status="Applied") == 1
+    assert application_store.count_applications(status="Offer") == 0
+    assert application_store.count_applications(company="acme") == 2
+    assert application_store.count_applications(date_from="2026-10-02") == 0
+    assert application_store.status_counts() == {"Applied": 1, "Interview": 1, "Rejected": 1}
+
+def test_counters_are_rebuilt_for_older_stores():
+    application_store.save_applications([app("Acme"), app("Beta")])
+    with application_store._connect() as db:
+        db.execute("DROP TABLE company_totals")
+    application_store.init_store()
+    assert application_store.companies() == ["Acme", "Beta"]
@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+import batch_matcher
+
+@pytest.mark.parametrize("analysis, score", [
+    ("1. **MATCH SCORE (0-100):** 72 — strong SQL and BI overlap, no people management.", 72),
+    ("**1. MATCH SCORE (0–100)**\n85/100 — the CV mirrors most of the JD.", 85),
+    ("1. MATCH SCORE (0 - 100): 64. Good analytics fit.\n2. TOP 3 STRENGTHS", 64),
+    ("MATCH SCORE: 91/100\nExcellent fit.", 91),
+    ("Match score — 0. The candidate has none of the required experience.", 0),
+    ("## Match Score\n**58** out of 100", 58),
+    ("The CV covers most requirements.", None),
+    (None, None),
+])
+def test_match_score(analysis, score):
+    assert batch_matcher.match_score(analysis) == score
+
+def test_prerank_puts_the_closest_posting_first():
+    postings = batch_matcher.postings_from_texts([
+        ("chef.txt", "Pastry chef for a busy hotel kitchen"),
+        ("bi.txt", "Business intelligence analyst, supply chain reporting in Power BI and Python"),
+        ("empty.txt", "   "),
+    ])
+    ranked = batch_matcher.prerank("Data analyst: Power BI, Python, supply chain reporting at a chemicals firm", postings)
+    assert list(ranked["title"]) == ["bi", "chef"]
+    assert ranked["prerank_score"].iloc[0] > ranked["prerank_score"].iloc[1] == 0
+
+def test_csv_needs_a_description_column(tmp_path):
+    path = tmp_path / "postings.csv"
+    pd.DataFrame({"company": ["Acme"], "summary": ["Analyst"]}).to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        batch_matcher.postings_from_csv(str(path), "postings.csv")
@@ -0,0 +1,18 @@
+import pandas as pd
+import data_backend
+from sales_cube import SalesCube
+
+def test_categories_are_sorted_whatever_the_row_order(tmp_path):
+    path = str(tmp_path / "sales.csv")
+    pd.DataFrame({
+        "month": ["2024-03", "2024-01", "2024-02", "2024-01"],
+        "region": ["North", "South", "North", "East"],
+        "product": ["A", "B", "A", "A"],
+        "revenue": [3.0, 1.0, 2.0, 1.5], "units_sold": [3, 1, 2, 1], "target": [1.0, 1.0, 1.0, 1.0],
+    }).to_csv(path, index=False)
+    df = data_backend.load_table(path, categorical=["month", "region", "product"])
+    assert list(df["month"].cat.categories) == ["2024-01", "2024-02", "2024-03"]
+    assert list(df.groupby("region", observed=True)["revenue"].sum().index) == ["East", "North", "South"]
+    cube = SalesCube.from_frame(df)
+    assert cube.axes["month"] == ["2024-01", "2024-02", "2024-03"]
+    assert list(cube.frame(["month"])["revenue"]) == [2.5, 2.0, 3.0]
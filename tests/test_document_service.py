@@ -0,0 +1,41 @@
+import os
+import pytest
+import document_service
+import index_cache
+
+DOCS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "docs")
+
+def read(name):
+    with open(os.path.join(DOCS, name), "rb") as f:
+        return f.read()
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(index_cache, "METRICS_DB", str(tmp_path / "metrics.sqlite"))
+    monkeypatch.setattr(index_cache, "_metrics_ready", False)
+    monkeypatch.setattr(document_service, "_loaded", document_service.OrderedDict())
+
+def test_streamed_chunks_are_stored_and_searched_later():
+    file_bytes = read("happy city indicators.pdf")
+    doc_id, chunks = document_service.document_chunks(file_bytes, workers=1)
+    streamed = list(chunks)
+    assert streamed
+    document_service._loaded.clear()
+    stored, engine = document_service.open_document(doc_id)
+    assert stored == streamed and engine is None
+    # The engine is built on the first search and stored alongside the chunks
+    assert document_service.search(doc_id, "happiness indicators", k=2)
+    document_service._loaded.clear()
+    assert document_service.open_document(doc_id)[1] is not None
+
+def test_unfinished_stream_stores_nothing():
+    doc_id, chunks = document_service.document_chunks(read("happy city indicators.pdf"), workers=1)
+    next(chunks)
+    chunks.close()
+    assert document_service.open_document(doc_id) is None
+
+def test_pdf_without_text_is_an_empty_document():
+    doc_id = document_service.ingest_document(read("OQEMA_Letter of Reference.pdf"), workers=1)
+    assert document_service.get_chunks(doc_id) == []
+    assert document_service.search(doc_id, "reference") == []
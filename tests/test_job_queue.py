@@ -0,0 +1,93 @@
+import threading
+import time
+import pytest
+import job_queue
+
+def wait(runner, job_id, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = runner.get_job(job_id)
+        if job["status"] in job_queue.FINISHED:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job {job_id} did not finish")
+
+def steps(n):
+    return [(f"s{i}", f"Step {i}", {"n": i}) for i in range(n)]
+
+def test_same_steps_run_once(tmp_path):
+    calls = []
+    runner = job_queue.JobRunner(lambda p: calls.append(p["n"]) or f"r{p['n']}", path=str(tmp_path / "jobs.sqlite"))
+    first = runner.submit("package", steps(3))
+    job = wait(runner, first)
+    assert runner.submit("package", steps(3)) == first
+    assert job["status"] == "done" and [s["result"] for s in job["steps"]] == ["r0", "r1", "r2"]
+    assert sorted(calls) == [0, 1, 2]
+
+def test_resubmit_reruns_only_failed_steps(tmp_path):
+    calls = []
+
+    def handler(payload):
+        calls.append(payload["n"])
+        if payload["n"] == 1 and calls.count(1) == 1:
+            raise RuntimeError("boom")
+        return "ok"
+
+    runner = job_queue.JobRunner(handler, path=str(tmp_path / "jobs.sqlite"))
+    job_id = runner.submit("package", steps(3))
+    job = wait(runner, job_id)
+    assert job["status"] == "failed" and job["steps"][1]["error"] == "RuntimeError: boom"
+    runner.submit("package", steps(3))
+    assert wait(runner, job_id)["status"] == "done"
+    assert sorted(calls) == [0, 1, 1, 2]
+
+def test_empty_job_is_rejected(tmp_path):
+    runner = job_queue.JobRunner(lambda p: "ok", path=str(tmp_path / "jobs.sqlite"))
+    with pytest.raises(ValueError):
+        runner.submit("batch", [])
+
+def test_stale_step_is_requeued_while_running(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    runner = job_queue.JobRunner(lambda p: "ok", path=path)
+    job_id = runner.submit("package", steps(1))
+    wait(runner, job_id)
+    # Simulate a step claimed by a process that died long ago
+    with job_queue._connect(path) as db:
+        db.execute("UPDATE job_steps SET status = 'running', result = NULL, updated = 0 WHERE job_id = ?", (job_id,))
+        db.execute("UPDATE jobs SET status = 'running' WHERE id = ?", (job_id,))
+    assert wait(runner, job_id)["steps"][0]["result"] == "ok"
+
+def test_fresh_running_step_is_left_alone(tmp_path):
+    path = str(tmp_path / "jobs.sqlite")
+    release = threading.Event()
+    runner = job_queue.JobRunner(lambda p: release.wait(5) and "ok", path=path, workers=1)
+    job_id = runner.submit("package", steps(1))
+    time.sleep(0.1)
+    assert runner.get_job(job_id)["steps"][0]["status"] == "running"
+    assert runner.queue.empty()
+    release.set()
+    assert wait(runner, job_id)["status"] == "done"
+
+def test_interactive_steps_go_before_queued_background_steps(tmp_path):
+    order, release = [], threading.Event()
+
+    def handler(payload):
+        release.wait(5)
+        order.append(payload["n"])
+        return "ok"
+
+    runner = job_queue.JobRunner(handler, path=str(tmp_path / "jobs.sqlite"), workers=1)
+    batch = runner.submit("batch", [(f"b{i}", "", {"n": f"b{i}", "priority": 1}) for i in range(4)])
+    time.sleep(0.1)
+    package = runner.submit("package", [("p", "", {"n": "p"})])
+    release.set()
+    wait(runner, batch), wait(runner, package)
+    # b0 already held the only worker; the package step overtakes the rest of the batch
+    assert order[:2] == ["b0", "p"]
+
+def test_resubmit_keeps_the_latest_meta(tmp_path):
+    runner = job_queue.JobRunner(lambda p: "ok", path=str(tmp_path / "jobs.sqlite"))
+    job_id = runner.submit("package", steps(2), meta={"company": "Acme"})
+    wait(runner, job_id)
+    assert runner.submit("package", steps(2), meta={"company": "Acme Ltd"}) == job_id
+    assert runner.get_job(job_id)["meta"] == {"company": "Acme Ltd"}
@@ -0,0 +1,49 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pytest
+import knowledge_base
+
+CHUNKS = [{"text": "supplier delivery rate fell in march", "page": 1},
+          {"text": "the cafeteria menu has new soups", "page": 1},
+          {"text": "holiday schedule for the office", "page": 2}]
+
+@pytest.mark.parametrize("storage", ["flat", "fp16", "sq8"])
+def test_only_chunks_with_query_terms_match(storage):
+    kb = knowledge_base.KnowledgeBase(storage=storage)
+    kb.add_document("report", "report.pdf", CHUNKS)
+    assert [hit["text"] for hit in kb.search("supplier delivery", k=3)] == [CHUNKS[0]["text"]]
+    assert kb.search("quarterly revenue", k=3) == []
+
+class FakeDense:
+    model_name = "fake/model"
+    dim = 4
+    value_range = (-1.0, 1.0)
+
+    def encode(self, texts):
+        return np.full((len(texts), self.dim), 0.5, dtype="float32")
+
+    def encode_query(self, query):
+        return np.full((1, self.dim), 0.5, dtype="float32")
+
+def test_dense_model_loads_on_first_use_or_with_stored_embeddings(tmp_path):
+    made = []
+
+    def make_dense():
+        made.append(1)
+        return FakeDense()
+
+    kb = knowledge_base.KnowledgeBase(dense=make_dense)
+    assert not made and kb.dense_index is None
+    kb.add_document("report", "report.pdf", CHUNKS)
+    assert len(made) == 1 and kb.dense_index.ntotal == len(CHUNKS)
+    kb.save(str(tmp_path))
+    reopened = knowledge_base.KnowledgeBase.load(str(tmp_path), dense=make_dense)
+    assert len(made) == 2 and reopened.dense_index.ntotal == len(CHUNKS)
+
+def test_importing_does_not_import_faiss():
+    code = "import sys, knowledge_base; print('faiss' in sys.modules)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert out.stdout.strip() == "False"
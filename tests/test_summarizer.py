@@ -0,0 +1,29 @@
+import threading
+import pytest
+import index_cache
+import summarizer
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(index_cache, "CACHE_DIR", str(tmp_path))
+    monkeypatch.setattr(index_cache, "METRICS_DB", str(tmp_path / "metrics.sqlite"))
+    monkeypatch.setattr(index_cache, "_metrics_ready", False)
+
+def test_failed_call_keeps_the_summaries_still_in_flight(monkeypatch):
+    failed = threading.Event()
+
+    def complete(client, messages, priority=None):
+        text = messages[1]["content"]
+        if "part 0" in text:
+            failed.set()
+            raise RuntimeError("rate limited")
+        # The other calls only finish after the failure has been raised
+        failed.wait(5)
+        return "summary of " + text[-6:]
+
+    monkeypatch.setattr(summarizer, "complete", complete)
+    batches = [f"part {i}" for i in range(4)]
+    with pytest.raises(RuntimeError):
+        summarizer._summarize_level(None, "doc", batches, summarizer.MAP_PROMPT, {}, 4, None, 0)
+    stored = index_cache.load_summaries("doc")
+    assert sorted(stored.values()) == ["summary of part 1", "summary of part 2", "summary of part 3"]
@@ -0,0 +1,30 @@
+import os
+import pandas as pd
+import pytest
+import supplier_risk
+
+DATA = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "supply_chain_data.csv")
+
+@pytest.fixture(scope="module")
+def supply():
+    return pd.read_csv(DATA)
+
+@pytest.mark.parametrize("suppliers", [["SupplierB"], ["SupplierB", "SupplierD", "SupplierE"]])
+def test_quiet_suppliers_have_no_anomalies(supply, suppliers):
+    findings, anomalies = supplier_risk.analyse(supply[supply["supplier"].isin(suppliers)])
+    assert anomalies.empty
+    assert sorted(findings["supplier"]) == sorted(suppliers)
+    assert (findings["anomalies"] == 0).all()
+    assert (findings["worst_anomaly"] == "").all()
+
+def test_single_month(supply):
+    findings, anomalies = supplier_risk.analyse(supply[supply["month"] == "2024-01"])
+    assert anomalies.empty
+    assert len(findings) == supply["supplier"].nunique()
+
+def test_planted_crisis_is_flagged(supply):
+    findings, anomalies = supplier_risk.analyse(supply)
+    assert not anomalies.empty
+    crisis = findings.set_index("supplier").loc["SupplierC"]
+    assert crisis["anomalies"] > 0
+    assert "SupplierC" in set(anomalies["supplier"]) and crisis["worst_anomaly"]
@@ -0,0 +1,111 @@
+import math
+import os
+
+# Token budgeting for every prompt we send. Retrieved chunks are packed in relevance
+# order until the context budget is spent (with the 50-character splitter overlap
+# between neighbouring chunks removed), chat history is trimmed from the oldest message,
+# and tables are rendered compactly and cut to whole rows. Counts use tiktoken's
+# cl100k_base, which is close to the Llama 3 tokenizer; if the encoding cannot be
+# loaded (e.g. offline) a 4-characters-per-token estimate is used instead.
+CONTEXT_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "2500"))
+HISTORY_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "1500"))
+TABLE_BUDGET = int(os.getenv("TABLE_TOKEN_BUDGET", "1500"))
+MESSAGE_OVERHEAD = 4  # role and separator tokens the chat template adds per message
+MIN_OVERLAP = 20
+
+_encoding = None
+
+def _get_encoding():
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    return _encoding
+
+def count_tokens(text):
+    encoding = _get_encoding()
+    if encoding:
+        return len(encoding.encode(text, disallowed_special=()))
+    return math.ceil(len(text) / 4)
+
+def message_tokens(messages):
+    """Tokens a list of chat messages costs, including the per-message overhead"""
+    return sum(count_tokens(m["content"]) + MESSAGE_OVERHEAD for m in messages)
+
+def truncate(text, max_tokens):
+    """Cut text to at most max_tokens, marking the cut"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding:
+        return encoding.decode(encoding.encode(text, disallowed_special=())[:max(max_tokens - 3, 0)]) + " […]"
+    return text[:max(max_tokens - 3, 0) * 4] + " […]"
+
+def remove_overlap(previous, text, max_overlap=200):
+    """Drop the start of `text` that repeats the end of `previous` (splitter overlap)"""
+    for size in range(min(max_overlap, len(previous), len(text)), MIN_OVERLAP - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:].lstrip()
+    return text
+
+def _text(chunk):
+    return chunk["text"] if isinstance(chunk, dict) else chunk
+
+def pack_chunks(chunks, budget=CONTEXT_BUDGET):
+    """Fill the budget with chunks in the order given (most relevant first).
+
+    Chunks may be strings or dicts with a "text" key; dicts are copied with the trimmed
+    text. Duplicates and text already contained in a packed chunk are skipped, overlap
+    with a packed chunk is cut, and a first chunk larger than the budget is truncated.
+    Returns (packed chunks, tokens used)."""
+    packed, texts, used = [], [], 0
+    for chunk in chunks:
+        text = _text(chunk)
+        if any(text in seen for seen in texts):
+            continue
+        for seen in texts:
+            text = remove_overlap(seen, text)
+        if not text:
+            continue
+        tokens = count_tokens(text)
+        if used + tokens > budget:
+            if packed:
+                continue
+            text = truncate(text, budget)
+            tokens = count_tokens(text)
+        packed.append(dict(chunk, text=text) if isinstance(chunk, dict) else text)
+        texts.append(text)
+        used += tokens
+    return packed, used
+
+def trim_history(messages, budget=HISTORY_BUDGET):
+    """Keep the newest messages that fit the budget; the latest one is always kept"""
+    kept, used = [], 0
+    for message in reversed(messages):
+        tokens = count_tokens(message["content"]) + MESSAGE_OVERHEAD
+        if kept and used + tokens > budget:
+            break
+        if not kept and tokens > budget:
+            message = dict(message, content=truncate(message["content"], budget - MESSAGE_OVERHEAD))
+            tokens = budget
+        kept.append(message)
+        used += tokens
+    return kept[::-1]
+
+def format_table(df, budget=TABLE_BUDGET, float_format="%.2f"):
+    """Render a DataFrame as CSV, keeping as many leading rows as fit the budget"""
+    text = df.to_csv(index=False, float_format=float_format)
+    if count_tokens(text) <= budget:
+        return text.strip()
+    # Binary search for the largest row prefix that still fits with the note appended
+    low, high = 0, len(df)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if count_tokens(df.head(mid).to_csv(index=False, float_format=float_format)) + 12 <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return df.head(low).to_csv(index=False, float_format=float_format).strip() + f"\n… {len(df) - low} more rows omitted"
@@ -0,0 +1,122 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+# Lightweight tracing for the apps. `span(name, **attributes)` times a block and nests under
+# the span open around it; `annotate` adds attributes (token counts, cache hits) to that
+# span from deeper in the call, and `record` adds a finished span after the fact for work
+# that cannot be wrapped in a block, such as a reply streamed out through st.write_stream.
+# Each Streamlit rerun calls `start_trace`, and its spans feed the sidebar performance
+# panel (`trace_rows`). With TRACE_FILE set, every span is also appended to that file as a
+# JSON line using the OpenTelemetry span fields (traceId, spanId, parentSpanId, start and
+# end in unix nanoseconds, attributes, status). Worker threads only see the trace when the
+# task is submitted through `bind`.
+TRACE_FILE = os.getenv("TRACE_FILE", "")
+
+_trace = contextvars.ContextVar("trace", default=None)
+_current = contextvars.ContextVar("span", default=None)
+_export_lock = threading.Lock()
+
+class Trace:
+    def __init__(self, name):
+        self.name = name
+        self.id = secrets.token_hex(16)
+        self.spans = []
+
+class Span:
+    def __init__(self, name, trace, parent, attributes):
+        self.name = name
+        self.trace = trace
+        self.parent = parent
+        self.id = secrets.token_hex(8)
+        self.attributes = dict(attributes)
+        self.error = None
+        self.start_ns = time.time_ns()
+        self.started = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_otel(self):
+        return {
+            "traceId": self.trace.id if self.trace else None,
+            "spanId": self.id,
+            "parentSpanId": self.parent.id if self.parent else None,
+            "name": self.name,
+            "kind": "INTERNAL",
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.start_ns + int(self.duration * 1e9),
+            "attributes": self.attributes,
+            "status": {"code": "ERROR", "message": self.error} if self.error else {"code": "OK"},
+            "resource": {"service.name": self.trace.name if self.trace else "background"},
+        }
+
+def start_trace(name):
+    """Begin a new trace (one per Streamlit rerun); later spans in this thread belong to it"""
+    trace = Trace(name)
+    _trace.set(trace)
+    _current.set(None)
+    return trace
+
+def _finish(span):
+    if span.trace is not None:
+        span.trace.spans.append(span)
+    if TRACE_FILE:
+        line = json.dumps(span.to_otel(), default=str)
+        with _export_lock, open(TRACE_FILE, "a") as f:
+            f.write(line + "\n")
+
+@contextmanager
+def span(name, **attributes):
+    s = Span(name, _trace.get(), _current.get(), attributes)
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        s.duration = time.perf_counter() - s.started
+        _finish(s)
+
+def annotate(**attributes):
+    """Add attributes to the innermost open span, if any"""
+    s = _current.get()
+    if s is not None:
+        s.set(**attributes)
+
+def record(name, started, error=None, **attributes):
+    """Add a span that began at perf_counter() value `started` and ends now"""
+    s = Span(name, _trace.get(), _current.get(), attributes)
+    s.duration = time.perf_counter() - started
+    s.started = started
+    s.start_ns -= int(s.duration * 1e9)
+    s.error = error
+    _finish(s)
+
+def bind(fn):
+    """Wrap `fn` to run in a copy of the caller's context, e.g. for pool.submit"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+def trace_rows(trace=None):
+    """Spans of a trace (default: the current one) in start order, indented by depth"""
+    trace = trace or _trace.get()
+    if trace is None:
+        return []
+    rows = []
+    for s in sorted(trace.spans, key=lambda s: s.started):
+        depth, parent = 0, s.parent
+        while parent is not None:
+            depth, parent = depth + 1, parent.parent
+        details = [f"{k}={v:.3g}" if isinstance(v, float) else f"{k}={v}" for k, v in s.attributes.items()]
+        if s.error:
+            details.append(s.error)
+        rows.append({"span": "  " * depth + s.name, "ms": round(s.duration * 1000, 1), "details": " · ".join(details)})
+    return rows